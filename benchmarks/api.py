@@ -0,0 +1,403 @@
+"""Latency and throughput benchmark for the authors/books API.
+
+Seeds a dataset, drives every endpoint with concurrent httpx.AsyncClient
+workers and prints p50/p95/p99 latency and throughput per scenario as JSON.
+
+    python benchmarks/api.py --authors 100000 --books 5000000 --output run.json
+    python benchmarks/api.py --skip-seed --baseline run.json
+
+Without --base-url the app is served in-process against --database-url.
+With --baseline the run exits with status 1 when a scenario regressed by more
+than --tolerance.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+SEED_BATCH_SIZE = 10000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        default=f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'test_project_bench.db')}",
+    )
+    parser.add_argument("--base-url", help="benchmark a running server instead")
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--books", type=int, default=50000)
+    parser.add_argument(
+        "--skip-seed", action="store_true", help="reuse an already seeded database"
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--requests", type=int, default=500, help="requests per scenario"
+    )
+    parser.add_argument(
+        "--scenarios", help="comma-separated subset of scenarios to run"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    return parser.parse_args(argv)
+
+
+async def seed(database_url: str, authors: int, books: int) -> None:
+    from sqlalchemy import func, insert, select, update
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from models import Author, Book, metadata
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(metadata.create_all)
+
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        for start in range(0, authors, SEED_BATCH_SIZE):
+            stop = min(start + SEED_BATCH_SIZE, authors)
+            await conn.execute(
+                insert(Author),
+                [{"id": i + 1, "name": f"Author {i + 1}"} for i in range(start, stop)],
+            )
+        rng = random.Random(0)
+        for start in range(0, books, SEED_BATCH_SIZE):
+            stop = min(start + SEED_BATCH_SIZE, books)
+            await conn.execute(
+                insert(Book),
+                [
+                    {
+                        "id": i + 1,
+                        "name": f"Book {i + 1}",
+                        "author_id": rng.randint(1, authors),
+                    }
+                    for i in range(start, stop)
+                ],
+            )
+        count = (
+            select(func.count()).where(Book.author_id == Author.id).scalar_subquery()
+        )
+        await conn.execute(update(Author).values(book_count=count))
+    await engine.dispose()
+    print(
+        f"seeded {authors} authors and {books} books in {time.perf_counter() - started:.1f}s",
+        file=sys.stderr,
+    )
+
+
+class State:
+    def __init__(self, authors: int, books: int, seed: int):
+        self.authors = authors
+        self.books = books
+        self.rng = random.Random(seed)
+        self.counter = itertools.count()
+        self.run_id = f"{os.getpid()}-{int(time.time())}"
+        self.created_authors: List[int] = []
+        self.created_books: List[int] = []
+        self.cursors: List[str] = []
+
+    def name(self, prefix: str) -> str:
+        return f"{prefix} {self.run_id}-{next(self.counter)}"
+
+    def author_id(self) -> int:
+        return self.rng.randint(1, self.authors)
+
+    def book_id(self) -> int:
+        return self.rng.randint(1, self.books)
+
+
+async def created_id(response: httpx.Response, into: List[int]) -> None:
+    if response.status_code == 200:
+        into.append(response.json()["data"]["id"])
+
+
+async def remember_cursor(response: httpx.Response, state: State) -> None:
+    if response.status_code == 200:
+        cursor = response.json().get("next_cursor")
+        if cursor:
+            state.cursors.append(cursor)
+
+
+# Each scenario returns (method, url, request kwargs, optional response hook).
+SCENARIOS: Dict[str, Callable] = {
+    "get_authors": lambda s: (
+        "GET",
+        "/authors",
+        {"params": {"limit": 50}},
+        lambda r: remember_cursor(r, s),
+    ),
+    "get_authors_deep_offset": lambda s: (
+        "GET",
+        "/authors",
+        {"params": {"skip": max(0, s.authors - 50), "limit": 50}},
+        None,
+    ),
+    "get_authors_cursor": lambda s: (
+        "GET",
+        "/authors",
+        {
+            "params": (
+                {"limit": 50, "cursor": s.rng.choice(s.cursors)}
+                if s.cursors
+                else {"limit": 50}
+            )
+        },
+        lambda r: remember_cursor(r, s),
+    ),
+    "get_authors_by_book_count": lambda s: (
+        "GET",
+        "/authors",
+        {"params": {"order_by": "book_count", "limit": 50}},
+        None,
+    ),
+    "get_authors_expand_books": lambda s: (
+        "GET",
+        "/authors",
+        {"params": {"limit": 50, "expand": "books", "books_limit": 5}},
+        None,
+    ),
+    "get_author": lambda s: ("GET", f"/authors/{s.author_id()}", {}, None),
+    "get_author_books": lambda s: (
+        "GET",
+        f"/authors/{s.author_id()}/books",
+        {"params": {"limit": 50}},
+        None,
+    ),
+    "get_author_stats": lambda s: (
+        "GET",
+        f"/authors/{s.author_id()}/stats",
+        {},
+        None,
+    ),
+    # Seeded names are "Author <n>", so the last word also prefix-matches
+    # every author whose number starts with n.
+    "search_authors": lambda s: (
+        "GET",
+        "/authors/search",
+        {"params": {"q": f"author {s.author_id()}", "limit": 20}},
+        None,
+    ),
+    "create_author": lambda s: (
+        "POST",
+        "/authors",
+        {"json": {"name": s.name("Bench Author")}},
+        lambda r: created_id(r, s.created_authors),
+    ),
+    "update_author": lambda s: (
+        "PATCH",
+        f"/authors/{s.rng.choice(s.created_authors) if s.created_authors else s.author_id()}",
+        {"json": {"name": s.name("Renamed Author")}},
+        None,
+    ),
+    "create_authors_bulk": lambda s: (
+        "POST",
+        "/authors/bulk",
+        {"json": [{"name": s.name("Bulk Author")} for _ in range(100)]},
+        None,
+    ),
+    "get_books": lambda s: ("GET", "/books", {"params": {"limit": 50}}, None),
+    "get_books_by_author": lambda s: (
+        "GET",
+        "/books",
+        {"params": {"author_id": s.author_id()}},
+        None,
+    ),
+    "get_book": lambda s: ("GET", f"/books/{s.book_id()}", {}, None),
+    "get_hot_book": lambda s: ("GET", "/books/1", {}, None),
+    "search_books": lambda s: (
+        "GET",
+        "/books/search",
+        {"params": {"q": f"book {s.book_id()}", "limit": 20}},
+        None,
+    ),
+    "batch_get_books": lambda s: (
+        "POST",
+        "/books/batch-get",
+        {"json": {"ids": [s.book_id() for _ in range(100)]}},
+        None,
+    ),
+    "create_book": lambda s: (
+        "POST",
+        "/books",
+        {"json": {"name": s.name("Bench Book"), "author_id": s.author_id()}},
+        lambda r: created_id(r, s.created_books),
+    ),
+    "update_book": lambda s: (
+        "PATCH",
+        f"/books/{s.rng.choice(s.created_books) if s.created_books else s.book_id()}",
+        {"json": {"author_id": s.author_id()}},
+        None,
+    ),
+    "create_books_bulk": lambda s: (
+        "POST",
+        "/books/bulk",
+        {
+            "json": [
+                {"name": s.name("Bulk Book"), "author_id": s.author_id()}
+                for _ in range(100)
+            ]
+        },
+        None,
+    ),
+    "export_books_by_author": lambda s: (
+        "GET",
+        "/books/export",
+        {"params": {"author_id": s.author_id()}},
+        None,
+    ),
+    "delete_book": lambda s: (
+        "DELETE",
+        f"/books/{s.created_books.pop() if s.created_books else 0}",
+        {},
+        None,
+    ),
+    "delete_author": lambda s: (
+        "DELETE",
+        f"/authors/{s.created_authors.pop() if s.created_authors else 0}",
+        {},
+        None,
+    ),
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(
+        len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, name: str, state: State, requests: int, concurrency: int
+) -> dict:
+    build = SCENARIOS[name]
+    latencies: List[float] = []
+    errors = 0
+    remaining = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < requests:
+            method, url, kwargs, hook = build(state)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                errors += 1
+            if hook is not None:
+                await hook(response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms"
+            )
+        if result["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']} -> {result['throughput_rps']} rps"
+            )
+        if result["errors"] > previous["errors"]:
+            regressions.append(
+                f"{name}: errors {previous['errors']} -> {result['errors']}"
+            )
+    return regressions
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.base_url:
+        # The app reads its settings at import time.
+        os.environ["DATABASE_URL"] = args.database_url
+        if not args.skip_seed:
+            await seed(args.database_url, args.authors, args.books)
+
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        from main import app
+
+        client = httpx.AsyncClient(app=app, base_url="http://bench", timeout=60)
+
+    state = State(args.authors, args.books, args.seed)
+    report = {
+        "config": {
+            "authors": args.authors,
+            "books": args.books,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "target": args.base_url or args.database_url,
+        },
+        "scenarios": {},
+    }
+    async with contextlib.AsyncExitStack() as stack:
+        if not args.base_url:
+            # httpx does not run the lifespan that opens the database.
+            await stack.enter_async_context(app.router.lifespan_context(app))
+        await stack.enter_async_context(client)
+        for name in names:
+            report["scenarios"][name] = await run_scenario(
+                client, name, state, args.requests, args.concurrency
+            )
+            print(f"{name}: {report['scenarios'][name]}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
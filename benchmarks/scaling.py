@@ -0,0 +1,171 @@
+"""Throughput scaling benchmark for the multi-process server.
+
+Seeds a dataset once, then for every worker count starts `python -m
+src.serve --workers N`, drives it with --clients load generator processes
+(benchmarks/api.py --base-url) and reports the combined throughput and the
+speedup over one worker as JSON.
+
+    python benchmarks/scaling.py --workers 1,2,4,8 --scenarios get_book,get_books
+
+The load generators share the machine with the server, so on small boxes
+they cap the numbers; compare worker counts up to about half the cores.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from api import seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API = os.path.join(ROOT, "benchmarks", "api.py")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        default=f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'test_project_bench.db')}",
+    )
+    parser.add_argument(
+        "--workers", default="1,2,4", help="comma-separated worker counts to compare"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--books", type=int, default=50000)
+    parser.add_argument(
+        "--skip-seed", action="store_true", help="reuse an already seeded database"
+    )
+    parser.add_argument("--scenarios", default="get_book,get_books,get_author_stats")
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="per client")
+    parser.add_argument("--requests", type=int, default=1000, help="per client and scenario")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def wait_until_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if httpx.get(f"{base_url}/health/pool").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"server at {base_url} did not start")
+        time.sleep(0.2)
+
+
+def run_clients(args, base_url: str) -> Dict[str, dict]:
+    command = [
+        sys.executable,
+        API,
+        "--base-url",
+        base_url,
+        "--skip-seed",
+        "--authors",
+        str(args.authors),
+        "--books",
+        str(args.books),
+        "--scenarios",
+        args.scenarios,
+        "--concurrency",
+        str(args.concurrency),
+        "--requests",
+        str(args.requests),
+    ]
+    clients = [
+        subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(args.clients)
+    ]
+    reports = [json.loads(client.communicate()[0]) for client in clients]
+
+    # Clients run side by side, so their throughputs add up.
+    results = {}
+    for name in args.scenarios.split(","):
+        runs = [report["scenarios"][name] for report in reports]
+        results[name] = {
+            "throughput_rps": round(sum(run["throughput_rps"] for run in runs), 1),
+            "p95_ms": max(run["p95_ms"] for run in runs),
+            "errors": sum(run["errors"] for run in runs),
+        }
+    return results
+
+
+def measure(args, workers: int) -> Dict[str, dict]:
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+    # src.serve turns the per-process memory:// cache off for more than one
+    # worker, so leave it off for one worker too, or the first run would not
+    # be comparable. Set CACHE_URL=redis://... to measure with a cache.
+    env.setdefault("CACHE_URL", "none")
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "src.serve",
+            "--workers",
+            str(workers),
+            "--port",
+            str(args.port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(base_url)
+        return run_clients(args, base_url)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.skip_seed:
+        asyncio.run(seed(args.database_url, args.authors, args.books))
+
+    counts: List[int] = [int(n) for n in args.workers.split(",")]
+    report = {
+        "config": {
+            "cores": os.cpu_count(),
+            "clients": args.clients,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "target": args.database_url,
+        },
+        "workers": {},
+    }
+    for workers in counts:
+        results = measure(args, workers)
+        report["workers"][str(workers)] = results
+        print(f"{workers} workers: {results}", file=sys.stderr)
+
+    first = report["workers"][str(counts[0])]
+    for results in report["workers"].values():
+        for name, result in results.items():
+            base = first[name]["throughput_rps"]
+            result["speedup"] = round(result["throughput_rps"] / base, 2) if base else None
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
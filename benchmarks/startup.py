@@ -0,0 +1,106 @@
+"""Cold-start benchmark for a worker process.
+
+Starts fresh Python processes and measures, in each, how long it takes to
+import the app module, build the app with create_app(), run the lifespan
+startup (engines and pool warm-up) and serve the first request. Prints the
+median and max of every phase as JSON.
+
+    python benchmarks/startup.py --runs 10 --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PHASES = ("import_ms", "create_app_ms", "startup_ms", "first_request_ms", "total_ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database-url",
+        default=f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'test_project_bench.db')}",
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/health/pool", help="first request to serve")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+async def measure(path: str) -> dict:
+    # Runs in the child process; everything before this function is the
+    # interpreter start, which the parent measures as part of total_ms.
+    started = time.perf_counter()
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    import httpx
+    import main
+
+    imported = time.perf_counter()
+    app = main.create_app()
+    created = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            response = await client.get(path)
+            response.raise_for_status()
+        served = time.perf_counter()
+    return {
+        "import_ms": (imported - started) * 1000,
+        "create_app_ms": (created - imported) * 1000,
+        "startup_ms": (ready - created) * 1000,
+        "first_request_ms": (served - ready) * 1000,
+    }
+
+
+def run_child(database_url: str, path: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", "--path", path],
+        env=env,
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["total_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.path))))
+        return 0
+
+    runs = [run_child(args.database_url, args.path) for _ in range(args.runs)]
+    report = {
+        "config": {"runs": args.runs, "path": args.path, "target": args.database_url},
+        "phases": {
+            phase: {
+                "median": round(statistics.median(run[phase] for run in runs), 1),
+                "max": round(max(run[phase] for run in runs), 1),
+            }
+            for phase in PHASES
+        },
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,12 +19,18 @@ from src.config import DATABASE_URL
 from src.models import metadata
 config = context.config
 
+# Callers running migrations programmatically (e.g. the tests) can pass the
+# URL in config.attributes instead of through the environment.
 section = config.config_ini_section
-config.set_section_option(section, "DATABASE_URL", DATABASE_URL)
+config.set_section_option(
+    section, "DATABASE_URL", config.attributes.get("database_url", DATABASE_URL)
+)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+if config.config_file_name is not None and config.attributes.get(
+    "configure_logger", True
+):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -33,6 +39,18 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = metadata
 
+
+
+def include_name(name, type_, parent_names):
+    # The search tables (FTS5 plus its shadow tables) and trigram indexes are
+    # created by hand in the name search migration, not from the models.
+    if type_ == "table":
+        return "_fts" not in name
+    if type_ == "index":
+        return not name.endswith("_trgm")
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -55,6 +73,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -64,7 +83,13 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        # SQLite cannot ALTER most things in place; batch mode recreates tables.
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,34 @@
+"""Add version columns
+
+Revision ID: 0f27b2ebb5df
+Revises: 1d59cb0d1c11
+Create Date: 2026-10-17 06:03:36.776447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0f27b2ebb5df'
+down_revision: Union[str, None] = '1d59cb0d1c11'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('author', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('book', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('book', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('author', schema=None) as batch_op:
+        batch_op.drop_column('version')
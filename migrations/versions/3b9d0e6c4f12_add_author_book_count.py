@@ -0,0 +1,37 @@
+"""Add author book_count
+
+Revision ID: 3b9d0e6c4f12
+Revises: 8c3e5a71d2b4
+Create Date: 2026-10-17 06:31:09.271583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d0e6c4f12'
+down_revision: Union[str, None] = '8c3e5a71d2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Plain ALTER TABLE rather than batch mode: recreating author on SQLite
+    # would drop its search triggers and the lower(name) index.
+    op.add_column('author', sa.Column('book_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Counts for the books that already exist; from here on the book write
+    # handlers keep them current.
+    op.execute(
+        'UPDATE author SET book_count = '
+        '(SELECT count(*) FROM book WHERE book.author_id = author.id)'
+    )
+    op.create_index('ix_author_book_count_id', 'author', ['book_count', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_author_book_count_id', table_name='author')
+    op.drop_column('author', 'book_count')
@@ -0,0 +1,72 @@
+"""Add name search
+
+Revision ID: 8c3e5a71d2b4
+Revises: f6a664995f87
+Create Date: 2026-10-17 06:12:48.503117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3e5a71d2b4'
+down_revision: Union[str, None] = 'f6a664995f87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('author', 'book')
+
+
+def upgrade() -> None:
+    # Same statements as src/search.py issues for metadata.create_all().
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for table in TABLES:
+            fts = f'{table}_fts'
+            op.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5("
+                f"name, content='{table}', content_rowid='id', prefix='2 3')"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, name) "
+                f"VALUES ('delete', old.id, old.name); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF name ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, name) "
+                f"VALUES ('delete', old.id, old.name); "
+                f"INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END"
+            )
+            # Index the rows that already exist.
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in TABLES:
+            op.create_index(
+                f'ix_{table}_name_trgm',
+                table,
+                ['name'],
+                postgresql_using='gin',
+                postgresql_ops={'name': 'gin_trgm_ops'},
+            )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for table in reversed(TABLES):
+            fts = f'{table}_fts'
+            for suffix in ('au', 'ad', 'ai'):
+                op.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {fts}')
+    elif dialect == 'postgresql':
+        for table in reversed(TABLES):
+            op.drop_index(f'ix_{table}_name_trgm', table_name=table)
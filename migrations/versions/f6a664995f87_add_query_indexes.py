@@ -0,0 +1,34 @@
+"""Add query indexes
+
+Revision ID: f6a664995f87
+Revises: 0f27b2ebb5df
+Create Date: 2026-10-17 06:03:37.128475
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a664995f87'
+down_revision: Union[str, None] = '0f27b2ebb5df'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ForeignKey() does not index book.author_id. The composite index serves
+    # ?author_id= filters and keyset pages within an author alike.
+    op.create_index('ix_book_author_id_id', 'book', ['author_id', 'id'], unique=False)
+    # Expression indexes for case-insensitive ?name= lookups; autogenerate
+    # cannot detect these.
+    op.create_index('ix_author_name_lower', 'author', [sa.text('lower(name)')], unique=False)
+    op.create_index('ix_book_name_lower', 'book', [sa.text('lower(name)')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_name_lower', table_name='book')
+    op.drop_index('ix_author_name_lower', table_name='author')
+    op.drop_index('ix_book_author_id_id', table_name='book')
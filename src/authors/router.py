@@ -1,34 +1,224 @@
+from collections import defaultdict
+from typing import Literal, Optional
+
 from fastapi import APIRouter
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Request
+from pydantic import ValidationError
 
-from sqlalchemy import delete, update
+from sqlalchemy import delete, func, insert, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.exc import NoResultFound
 
-from database import get_async_session
-from models import Author
-from authors.schemas import AuthorRead, AuthorCreate, AuthorUpdate
+from bulk import (
+    BatchGet,
+    batched,
+    dialect_insert,
+    in_request_order,
+    item_result,
+    read_items,
+    summarize,
+    validation_message,
+)
+from cache import get_cache, item_key, list_key, lookup, store
+from changelog import change, record_changes
+from database import get_async_session, get_read_session, is_foreign_key_violation
+from etag import conditional_response, page_etag, resource_etag
+from export import ExportFormat, export_response
+from loader import BatchLoader, loader_dependency
+from models import Author, Book
+from pagination import decode_cursor, encode_cursor
+from responses import json_response, rows_to_dicts
+from search import search_select
+from authors.schemas import (
+    AUTHOR_READ_FIELDS,
+    AUTHOR_STATS_FIELDS,
+    AuthorRead,
+    AuthorCreate,
+    AuthorUpdate,
+)
+from books.schemas import BOOK_READ_FIELDS
 
 router = APIRouter()
 
 
+async def fetch_authors(session: AsyncSession, ids) -> list:
+    stmt = select(Author.id, Author.name, Author.version).where(Author.id.in_(ids))
+    return (await session.execute(stmt)).all()
+
+
+get_author_loader = loader_dependency(fetch_authors)
+
+INCLUDE_OPTIONS = {"books"}
+EXPAND_OPTIONS = {"books"}
+
+# Pages ordered by book_count also change with every book write, which
+# bumps only "authors:book_count" (see books.router.list_namespaces).
+LIST_NAMESPACES = ("authors", "authors:book_count")
+
+
+def parse_include(
+    include: Optional[str], options: set = INCLUDE_OPTIONS, param: str = "include"
+) -> set:
+    if include is None:
+        return set()
+    requested = {part.strip() for part in include.split(",") if part.strip()}
+    unknown = requested - options
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": f"Unknown {param}: {', '.join(sorted(unknown))}",
+            },
+        )
+    return requested
+
+
+def author_select(includes: set, *columns):
+    # Only the columns AuthorRead needs are fetched unless the caller asked
+    # for the books, which are then loaded with one extra IN query per page.
+    if "books" in includes:
+        return select(Author).options(selectinload(Author.books))
+    return select(Author.id, Author.name, Author.version, *columns)
+
+
+def authors_to_dicts(authors, includes: set, fields=AUTHOR_READ_FIELDS) -> list:
+    author_data = rows_to_dicts(authors, fields)
+    if "books" in includes:
+        for item, author in zip(author_data, authors):
+            item["books"] = rows_to_dicts(author.books, BOOK_READ_FIELDS)
+    return author_data
+
+
+async def expand_books(db: AsyncSession, author_data: list, books_limit: int) -> None:
+    # One query for the whole page. row_number() per author cuts each
+    # author's books at books_limit inside the database, so an author with
+    # thousands of titles costs no more memory than one with a few; the extra
+    # row tells whether /authors/{id}/books has more.
+    author_ids = [item["id"] for item in author_data]
+    books = defaultdict(list)
+    if author_ids:
+        position = (
+            func.row_number()
+            .over(partition_by=Book.author_id, order_by=Book.id)
+            .label("position")
+        )
+        ranked = (
+            select(Book.id, Book.name, Book.author_id, position)
+            .where(Book.author_id.in_(author_ids))
+            .subquery()
+        )
+        stmt = (
+            select(ranked.c.id, ranked.c.name, ranked.c.author_id)
+            .where(ranked.c.position <= books_limit + 1)
+            .order_by(ranked.c.author_id, ranked.c.id)
+        )
+        for row in await db.execute(stmt):
+            books[row.author_id].append(row)
+
+    for item in author_data:
+        author_books = books[item["id"]]
+        page = author_books[:books_limit]
+        item["books"] = rows_to_dicts(page, BOOK_READ_FIELDS)
+        item["books_next_cursor"] = (
+            encode_cursor({"id": page[-1].id})
+            if len(author_books) > books_limit and page
+            else None
+        )
+
+
 @router.get("", response_model=dict)
 async def get_authors(
-    skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_async_session)
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    include: Optional[str] = None,
+    expand: Optional[str] = None,
+    books_limit: int = 10,
+    name: Optional[str] = None,
+    order_by: Literal["id", "book_count"] = "id",
+    db: AsyncSession = Depends(get_read_session),
+    cache=Depends(get_cache),
 ):
+    # With a cursor the page starts right after the last seen row, so it
+    # costs the same at any depth; skip is kept for older clients and uses
+    # OFFSET. order_by=book_count ranks authors with the most books first and
+    # walks ix_author_book_count_id backwards. expand=books adds the first
+    # books_limit books of every author; include=books adds all of them.
+    by_count = order_by == "book_count"
+    if cursor is None:
+        position = None
+    elif by_count:
+        position = decode_cursor(cursor, "book_count")
+    else:
+        position = decode_cursor(cursor)
+    includes = parse_include(include)
+    expands = parse_include(expand, EXPAND_OPTIONS, "expand")
+    if expands:
+        includes = set()
+    cache_key = None
+    if not includes and not expands:
+        namespace = "authors:book_count" if by_count else "authors"
+        cache_key = await list_key(cache, namespace, skip, limit, cursor, name, order_by)
+        cached = await lookup(cache, request, cache_key)
+        if cached is not None:
+            return conditional_response(request, cached["etag"], cached["body"])
     try:
-        stmt = select(Author).offset(skip).limit(limit)
+        if by_count:
+            stmt = author_select(includes, Author.book_count).order_by(
+                Author.book_count.desc(), Author.id.desc()
+            )
+        else:
+            stmt = author_select(includes).order_by(Author.id)
+        stmt = stmt.limit(limit + 1)
+        if name is not None:
+            stmt = stmt.where(func.lower(Author.name) == name.lower())
+        if position is None:
+            stmt = stmt.offset(skip)
+        elif by_count:
+            stmt = stmt.where(
+                tuple_(Author.book_count, Author.id)
+                < tuple_(position["book_count"], position["id"])
+            )
+        else:
+            stmt = stmt.where(Author.id > position["id"])
+
         authors = await db.execute(stmt)
-        author_data = [
-            AuthorRead(id=author.id, name=author.name).model_dump()
-            for author in authors.unique().scalars().all()
-        ]
-        return {
+        authors = authors.scalars().all() if includes else authors.all()
+        next_cursor = None
+        if len(authors) > limit:
+            authors = authors[:limit]
+            if authors:
+                last = authors[-1]
+                if by_count:
+                    next_cursor = encode_cursor(
+                        {"book_count": last.book_count, "id": last.id}
+                    )
+                else:
+                    next_cursor = encode_cursor({"id": last.id})
+
+        fields = AUTHOR_READ_FIELDS + ("book_count",) if by_count else AUTHOR_READ_FIELDS
+        body = {
             "status": "success",
-            "data": author_data,
+            "data": authors_to_dicts(authors, includes, fields),
             "detail": None,
+            "next_cursor": next_cursor,
         }
+        if expands:
+            await expand_books(db, body["data"], books_limit)
+        if includes or expands:
+            return json_response(request, body)
+
+        etag = page_etag(
+            authors, next_cursor, ("version", "book_count") if by_count else ("version",)
+        )
+        await store(cache, db, cache_key, {"etag": etag, "body": body})
+        return conditional_response(request, etag, body)
     except Exception:
         raise HTTPException(
             status_code=500,
@@ -40,22 +230,104 @@ async def get_authors(
         )
 
 
+@router.get("/export")
+async def export_authors(
+    format: ExportFormat = "ndjson", db: AsyncSession = Depends(get_read_session)
+):
+    stmt = select(Author.id, Author.name).order_by(Author.id)
+    return export_response(db, stmt, ("id", "name"), format, "authors")
+
+
+@router.get("/search", response_model=dict)
+async def search_authors(
+    request: Request,
+    q: str,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+    cache=Depends(get_cache),
+):
+    position = decode_cursor(cursor, "rank") if cursor is not None else None
+    cache_key = await list_key(cache, "authors", "search", q, limit, cursor)
+    cached = await lookup(cache, request, cache_key)
+    if cached is not None:
+        return conditional_response(request, cached["etag"], cached["body"])
+    try:
+        stmt = search_select(
+            Author,
+            (Author.id, Author.name, Author.version),
+            q,
+            db.bind.dialect.name,
+            position,
+        )
+        authors = []
+        if stmt is not None:
+            authors = (await db.execute(stmt.limit(limit + 1))).all()
+        next_cursor = None
+        if len(authors) > limit:
+            authors = authors[:limit]
+            if authors:
+                next_cursor = encode_cursor(
+                    {"rank": authors[-1].rank, "id": authors[-1].id}
+                )
+
+        body = {
+            "status": "success",
+            "data": rows_to_dicts(authors, AUTHOR_READ_FIELDS),
+            "detail": None,
+            "next_cursor": next_cursor,
+        }
+        etag = page_etag(authors, next_cursor)
+        await store(cache, db, cache_key, {"etag": etag, "body": body})
+        return conditional_response(request, etag, body)
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while searching authors",
+            },
+        )
+
+
 @router.get("/{author_id}", response_model=dict)
-async def get_author(author_id: int, db: AsyncSession = Depends(get_async_session)):
+async def get_author(
+    request: Request,
+    author_id: int,
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+    cache=Depends(get_cache),
+    loader: BatchLoader = Depends(get_author_loader),
+):
+    includes = parse_include(include)
+    cache_key = None
+    if not includes:
+        cache_key = await item_key(cache, f"author:{author_id}")
+        cached = await lookup(cache, request, cache_key)
+        if cached is not None:
+            return conditional_response(request, cached["etag"], cached["body"])
     try:
-        stmt = select(Author).where(Author.id == author_id)
-        db_author = await db.execute(stmt)
-        db_author = db_author.unique().scalar_one_or_none()
-        print(db_author)
+        if includes:
+            stmt = author_select(includes).where(Author.id == author_id)
+            db_author = (await db.execute(stmt)).scalar_one_or_none()
+        else:
+            db_author = await loader.load(db.bind, author_id)
 
         if db_author is None:
             raise NoResultFound
 
-        return {
+        body = {
             "status": "success",
-            "data": AuthorRead(id=db_author.id, name=db_author.name).model_dump(),
+            "data": authors_to_dicts([db_author], includes)[0],
             "detail": None,
         }
+        if includes:
+            return json_response(request, body)
+
+        etag = resource_etag("author", db_author.id, db_author.version)
+        await store(cache, db, cache_key, {"etag": etag, "body": body})
+        return conditional_response(request, etag, body)
     except NoResultFound:
         raise HTTPException(
             status_code=404,
@@ -76,15 +348,139 @@ async def get_author(author_id: int, db: AsyncSession = Depends(get_async_sessio
         )
 
 
+@router.get("/{author_id}/books", response_model=dict)
+async def get_author_books(
+    request: Request,
+    author_id: int,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+    cache=Depends(get_cache),
+):
+    # Unlike GET /books?author_id=, an author without books is an empty page
+    # rather than a 404; only unknown authors are.
+    position = decode_cursor(cursor) if cursor is not None else None
+    cache_key = await list_key(cache, f"books:author:{author_id}", "nested", limit, cursor)
+    cached = await lookup(cache, request, cache_key)
+    if cached is not None:
+        return conditional_response(request, cached["etag"], cached["body"])
+    try:
+        stmt = (
+            select(Book.id, Book.name, Book.author_id, Book.version)
+            .where(Book.author_id == author_id)
+            .order_by(Book.id)
+            .limit(limit + 1)
+        )
+        if position is not None:
+            stmt = stmt.where(Book.id > position["id"])
+
+        books = (await db.execute(stmt)).all()
+        if not books and position is None:
+            if await db.scalar(select(Author.id).where(Author.id == author_id)) is None:
+                raise NoResultFound
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            if books:
+                next_cursor = encode_cursor({"id": books[-1].id})
+
+        body = {
+            "status": "success",
+            "data": rows_to_dicts(books, BOOK_READ_FIELDS),
+            "detail": None,
+            "next_cursor": next_cursor,
+        }
+        etag = page_etag(books, next_cursor)
+        await store(cache, db, cache_key, {"etag": etag, "body": body})
+        return conditional_response(request, etag, body)
+    except NoResultFound:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Author not found",
+            },
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while fetching the author's books",
+            },
+        )
+
+
+@router.get("/{author_id}/stats", response_model=dict)
+async def get_author_stats(
+    request: Request,
+    author_id: int,
+    db: AsyncSession = Depends(get_read_session),
+    cache=Depends(get_cache),
+):
+    # Answered from the author row alone; book writes keep book_count
+    # current and bump this entry's generation.
+    cache_key = await item_key(cache, f"author:{author_id}:stats")
+    cached = await lookup(cache, request, cache_key)
+    if cached is not None:
+        return conditional_response(request, cached["etag"], cached["body"])
+    try:
+        stmt = select(
+            Author.id, Author.name, Author.version, Author.book_count
+        ).where(Author.id == author_id)
+        db_author = (await db.execute(stmt)).one_or_none()
+
+        if db_author is None:
+            raise NoResultFound
+
+        body = {
+            "status": "success",
+            "data": rows_to_dicts([db_author], AUTHOR_STATS_FIELDS)[0],
+            "detail": None,
+        }
+        etag = resource_etag(
+            "author-stats", db_author.id, f"{db_author.version}.{db_author.book_count}"
+        )
+        await store(cache, db, cache_key, {"etag": etag, "body": body})
+        return conditional_response(request, etag, body)
+    except NoResultFound:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Author not found",
+            },
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while fetching the author stats",
+            },
+        )
+
+
 @router.post("", response_model=dict)
 async def create_author(
-    author: AuthorCreate, db: AsyncSession = Depends(get_async_session)
+    author: AuthorCreate,
+    db: AsyncSession = Depends(get_async_session),
+    cache=Depends(get_cache),
 ):
     try:
-        db_author = Author(**author.model_dump())
-        db.add(db_author)
+        stmt = (
+            insert(Author)
+            .values(**author.model_dump())
+            .returning(Author.id, Author.name)
+        )
+        db_author = (await db.execute(stmt)).one()
+        await record_changes(db, change("author", "create", db_author.id, db_author.id))
         await db.commit()
-        await db.refresh(db_author)
+        await cache.bump(*LIST_NAMESPACES)
 
         return {
             "status": "success",
@@ -103,26 +499,133 @@ async def create_author(
         )
 
 
+@router.post("/bulk", response_model=dict)
+async def create_authors_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+    cache=Depends(get_cache),
+):
+    items = await read_items(request)
+    results = [None] * len(items)
+    pending = {}
+    for index, item in enumerate(items):
+        try:
+            author = AuthorCreate.model_validate(item)
+        except ValidationError as error:
+            results[index] = item_result(index, "error", detail=validation_message(error))
+            continue
+        if author.name in pending:
+            results[index] = item_result(index, "error", detail="Duplicate name in request")
+            continue
+        pending[author.name] = index
+
+    try:
+        insert_stmt = (
+            dialect_insert(db)(Author)
+            .on_conflict_do_nothing()
+            .returning(Author.id, Author.name)
+        )
+        for names in batched(list(pending)):
+            existing = await db.execute(
+                select(Author.id, Author.name).where(Author.name.in_(names))
+            )
+            existing = {row.name: row.id for row in existing}
+            new_names = [name for name in names if name not in existing]
+            created = {}
+            if new_names:
+                rows = await db.execute(insert_stmt, [{"name": name} for name in new_names])
+                created = {row.name: row.id for row in rows}
+                await record_changes(
+                    db, *(change("author", "create", id, id) for id in created.values())
+                )
+
+            for name in names:
+                index = pending[name]
+                if name in created:
+                    results[index] = item_result(index, "created", created[name])
+                else:
+                    results[index] = item_result(index, "existing", existing.get(name))
+
+        await db.commit()
+        await cache.bump(*LIST_NAMESPACES)
+
+        return {
+            "status": "success",
+            "data": summarize(results),
+            "detail": None,
+        }
+    except Exception:
+        await db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while creating the authors",
+            },
+        )
+
+
+@router.post("/batch-get", response_model=dict)
+async def batch_get_authors(
+    request: Request,
+    batch: BatchGet,
+    db: AsyncSession = Depends(get_read_session),
+    loader: BatchLoader = Depends(get_author_loader),
+):
+    # One IN query for the whole batch, shared with concurrent reads of the
+    # same ids; duplicates are dropped and the first-seen order is kept.
+    ids = list(dict.fromkeys(batch.ids))
+    try:
+        rows = await loader.load_many(db.bind, ids)
+        rows = [row for row in rows if row is not None]
+        return json_response(
+            request,
+            {
+                "status": "success",
+                "data": in_request_order(ids, rows, AUTHOR_READ_FIELDS),
+                "detail": None,
+            },
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while fetching authors",
+            },
+        )
+
+
 @router.patch("/{author_id}", response_model=dict)
 async def update_author(
     author_id: int,
     updated_author: AuthorUpdate,
     db: AsyncSession = Depends(get_async_session),
+    cache=Depends(get_cache),
 ):
     try:
         stmt = (
             update(Author)
             .where(Author.id == author_id)
-            .values(**updated_author.model_dump())
-            .returning(Author)
+            .values(
+                **updated_author.model_dump(exclude_unset=True),
+                version=Author.version + 1,
+            )
+            .returning(Author.id, Author.name)
         )
         updated_author_data = await db.execute(stmt)
-        updated_author_data = updated_author_data.unique().scalar_one_or_none()
+        updated_author_data = updated_author_data.one_or_none()
 
         if updated_author_data is None:
             raise NoResultFound
 
+        await record_changes(db, change("author", "update", author_id, author_id))
         await db.commit()
+        await cache.bump(
+            f"author:{author_id}", f"author:{author_id}:stats", *LIST_NAMESPACES
+        )
 
         return {
             "status": "success",
@@ -154,15 +657,27 @@ async def update_author(
 
 
 @router.delete("/{author_id}", response_model=dict)
-async def delete_author(author_id: int, db: AsyncSession = Depends(get_async_session)):
+async def delete_author(
+    author_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    cache=Depends(get_cache),
+):
     try:
-        stmt = delete(Author).where(Author.id == author_id)
+        stmt = delete(Author).where(Author.id == author_id).returning(Author.id)
         result = await db.execute(stmt)
 
-        if result is None:
+        if result.one_or_none() is None:
             raise NoResultFound
 
+        await record_changes(db, change("author", "delete", author_id, author_id))
         await db.commit()
+        # Also drops the empty /authors/{id}/books pages of this author.
+        await cache.bump(
+            f"author:{author_id}",
+            f"author:{author_id}:stats",
+            *LIST_NAMESPACES,
+            f"books:author:{author_id}",
+        )
 
         return {
             "status": "success",
@@ -179,9 +694,17 @@ async def delete_author(author_id: int, db: AsyncSession = Depends(get_async_ses
                 "detail": "Author not found",
             },
         )
-
-    except Exception:
+    except Exception as error:
         await db.rollback()
+        if isinstance(error, IntegrityError) and is_foreign_key_violation(error):
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "status": "error",
+                    "data": None,
+                    "detail": "Author still has books",
+                },
+            )
         raise HTTPException(
             status_code=500,
             detail={
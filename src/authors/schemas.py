@@ -12,6 +12,11 @@ class AuthorRead(AuthorBase):
         orm_mode = True
 
 
+# Keys of AuthorRead in response order, for building items straight from rows.
+AUTHOR_READ_FIELDS = ("id", "name")
+AUTHOR_STATS_FIELDS = ("id", "name", "book_count")
+
+
 class AuthorCreate(AuthorBase):
     pass
 
@@ -1,47 +1,158 @@
-from typing import Optional
+from collections import Counter
+from typing import Literal, Optional
 
 from fastapi import APIRouter
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Request
+from pydantic import ValidationError
 
-from sqlalchemy import delete, update
+from sqlalchemy import bindparam, delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm.exc import NoResultFound
 
-from database import get_async_session
+from bulk import (
+    BatchGet,
+    batched,
+    dialect_insert,
+    in_request_order,
+    item_result,
+    read_items,
+    summarize,
+    validation_message,
+)
+from cache import get_cache, item_key, list_key, lookup, store
+from changelog import change, record_changes
+from database import get_async_session, get_read_session, is_foreign_key_violation
+from etag import conditional_response, page_etag, resource_etag
+from export import ExportFormat, export_response
+from loader import BatchLoader, loader_dependency
 from models import Book, Author
-from books.schemas import BookRead, BookCreate, BookUpdate
+from pagination import decode_cursor, encode_cursor
+from responses import json_response, rows_to_dicts
+from search import search_select
+from books.schemas import BOOK_READ_FIELDS, BookCreate, BookUpdate
 
 router = APIRouter()
 
 
+async def fetch_books(session: AsyncSession, ids) -> list:
+    stmt = select(Book.id, Book.name, Book.author_id, Book.version).where(Book.id.in_(ids))
+    return (await session.execute(stmt)).all()
+
+
+get_book_loader = loader_dependency(fetch_books)
+
+
+def list_namespaces(*author_ids) -> list:
+    # Unfiltered pages change with any book; ?author_id= pages only with the
+    # books of that author. Authors ranked by book_count move too.
+    return ["books", "authors:book_count"] + [
+        f"books:author:{author_id}" for author_id in set(author_ids) if author_id is not None
+    ]
+
+
+def stats_names(*author_ids) -> list:
+    return [
+        f"author:{author_id}:stats" for author_id in set(author_ids) if author_id is not None
+    ]
+
+
+def change_book_count(author_id: int, delta: int):
+    return (
+        update(Author)
+        .where(Author.id == author_id)
+        .values(book_count=Author.book_count + delta)
+    )
+
+
+async def change_book_counts(db: AsyncSession, deltas: Counter) -> None:
+    # For writes that touch many authors at once: one executemany of
+    # relative updates, so book_count stays right next to concurrent
+    # writers. Rows are updated in author id order, so two bulk writes lock
+    # the authors they share in the same order and cannot deadlock.
+    authors = Author.__table__
+    stmt = (
+        update(authors)
+        .where(authors.c.id == bindparam("author"))
+        .values(book_count=authors.c.book_count + bindparam("delta"))
+    )
+    params = [
+        {"author": author_id, "delta": delta}
+        for author_id, delta in sorted(deltas.items())
+        if delta
+    ]
+    if params:
+        await db.execute(stmt, params)
+
+
+def author_does_not_exist() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail={
+            "status": "error",
+            "data": None,
+            "detail": "Author does not exist",
+        },
+    )
+
+
 @router.get("", response_model=dict)
 async def get_books(
+    request: Request,
     author_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 10,
-    db: AsyncSession = Depends(get_async_session),
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+    cache=Depends(get_cache),
 ):
+    # With a cursor the page starts right after the last seen id, so it costs
+    # the same at any depth; skip is kept for older clients and uses OFFSET.
+    position = decode_cursor(cursor) if cursor is not None else None
+    namespace = "books" if author_id is None else f"books:author:{author_id}"
+    cache_key = await list_key(cache, namespace, skip, limit, cursor, name)
+    cached = await lookup(cache, request, cache_key)
+    if cached is not None:
+        return conditional_response(request, cached["etag"], cached["body"])
     try:
-        stmt = select(Book).offset(skip).limit(limit)
+        stmt = (
+            select(Book.id, Book.name, Book.author_id, Book.version)
+            .order_by(Book.id)
+            .limit(limit + 1)
+        )
         if author_id is not None:
             stmt = stmt.where(Book.author_id == author_id)
-            
+        if name is not None:
+            stmt = stmt.where(func.lower(Book.name) == name.lower())
+        if position is not None:
+            stmt = stmt.where(Book.id > position["id"])
+        else:
+            stmt = stmt.offset(skip)
+
         books = await db.execute(stmt)
-        
-        book_data = [
-            BookRead(id=book.id, name=book.name, author_id=book.author_id).model_dump()
-            for book in books.unique().scalars().all()
-        ]
-        
-        if not book_data and author_id is not None:
+        books = books.all()
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            if books:
+                next_cursor = encode_cursor({"id": books[-1].id})
+
+        book_data = rows_to_dicts(books, BOOK_READ_FIELDS)
+
+        if not book_data and author_id is not None and position is None:
             raise NoResultFound
 
-        return {
+        body = {
             "status": "success",
             "data": book_data,
             "detail": None,
+            "next_cursor": next_cursor,
         }
+        etag = page_etag(books, next_cursor)
+        await store(cache, db, cache_key, {"etag": etag, "body": body})
+        return conditional_response(request, etag, body)
 
     except NoResultFound:
         raise HTTPException(
@@ -63,23 +174,97 @@ async def get_books(
         )
 
 
+@router.get("/export")
+async def export_books(
+    author_id: Optional[int] = None,
+    format: ExportFormat = "ndjson",
+    db: AsyncSession = Depends(get_read_session),
+):
+    stmt = select(Book.id, Book.name, Book.author_id).order_by(Book.id)
+    if author_id is not None:
+        stmt = stmt.where(Book.author_id == author_id)
+    return export_response(db, stmt, ("id", "name", "author_id"), format, "books")
+
+
+@router.get("/search", response_model=dict)
+async def search_books(
+    request: Request,
+    q: str,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+    cache=Depends(get_cache),
+):
+    position = decode_cursor(cursor, "rank") if cursor is not None else None
+    cache_key = await list_key(cache, "books", "search", q, limit, cursor)
+    cached = await lookup(cache, request, cache_key)
+    if cached is not None:
+        return conditional_response(request, cached["etag"], cached["body"])
+    try:
+        stmt = search_select(
+            Book,
+            (Book.id, Book.name, Book.author_id, Book.version),
+            q,
+            db.bind.dialect.name,
+            position,
+        )
+        books = []
+        if stmt is not None:
+            books = (await db.execute(stmt.limit(limit + 1))).all()
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            if books:
+                next_cursor = encode_cursor(
+                    {"rank": books[-1].rank, "id": books[-1].id}
+                )
+
+        body = {
+            "status": "success",
+            "data": rows_to_dicts(books, BOOK_READ_FIELDS),
+            "detail": None,
+            "next_cursor": next_cursor,
+        }
+        etag = page_etag(books, next_cursor)
+        await store(cache, db, cache_key, {"etag": etag, "body": body})
+        return conditional_response(request, etag, body)
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while searching books",
+            },
+        )
+
+
 @router.get("/{book_id}", response_model=dict)
-async def get_book(book_id: int, db: AsyncSession = Depends(get_async_session)):
+async def get_book(
+    request: Request,
+    book_id: int,
+    db: AsyncSession = Depends(get_read_session),
+    cache=Depends(get_cache),
+    loader: BatchLoader = Depends(get_book_loader),
+):
+    cache_key = await item_key(cache, f"book:{book_id}")
+    cached = await lookup(cache, request, cache_key)
+    if cached is not None:
+        return conditional_response(request, cached["etag"], cached["body"])
     try:
-        stmt = select(Book).where(Book.id == book_id)
-        db_book = await db.execute(stmt)
-        db_book = db_book.unique().scalar_one_or_none()
+        db_book = await loader.load(db.bind, book_id)
 
         if db_book is None:
             raise NoResultFound
 
-        return {
+        body = {
             "status": "success",
-            "data": BookRead(
-                id=db_book.id, name=db_book.name, author_id=db_book.author_id
-            ).model_dump(),
+            "data": rows_to_dicts([db_book], BOOK_READ_FIELDS)[0],
             "detail": None,
         }
+        etag = resource_etag("book", db_book.id, db_book.version)
+        await store(cache, db, cache_key, {"etag": etag, "body": body})
+        return conditional_response(request, etag, body)
     except NoResultFound:
         raise HTTPException(
             status_code=404,
@@ -101,23 +286,147 @@ async def get_book(book_id: int, db: AsyncSession = Depends(get_async_session)):
 
 
 @router.post("", response_model=dict)
-async def create_book(book: BookCreate, db: AsyncSession = Depends(get_async_session)):
+async def create_book(
+    book: BookCreate,
+    db: AsyncSession = Depends(get_async_session),
+    cache=Depends(get_cache),
+):
     try:
-        author = await db.execute(select(Author).where(Author.id == book.author_id))
-        author = author.unique().scalar_one_or_none()
-        if author is None:
-            raise HTTPException(status_code=400, detail="Author does not exist")
+        # The foreign key rejects unknown authors, so no lookup is needed first.
+        stmt = (
+            insert(Book)
+            .values(**book.model_dump())
+            .returning(Book.id, Book.name, Book.author_id)
+        )
+        db_book = (await db.execute(stmt)).one()
+        await db.execute(change_book_count(db_book.author_id, 1))
+        await record_changes(
+            db, change("book", "create", db_book.id, db_book.author_id)
+        )
+        await db.commit()
+        await cache.bump(
+            *stats_names(db_book.author_id), *list_namespaces(db_book.author_id)
+        )
+
+        return {
+            "status": "success",
+            "data": rows_to_dicts([db_book], BOOK_READ_FIELDS)[0],
+            "detail": None,
+        }
+    except Exception as error:
+        await db.rollback()
+        if isinstance(error, IntegrityError) and is_foreign_key_violation(error):
+            raise author_does_not_exist()
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while creating the book",
+            },
+        )
+
+
+@router.post("/bulk", response_model=dict)
+async def create_books_bulk(
+    request: Request,
+    on_conflict: Literal["skip", "update"] = "skip",
+    db: AsyncSession = Depends(get_async_session),
+    cache=Depends(get_cache),
+):
+    items = await read_items(request)
+    results = [None] * len(items)
+    pending = {}
+    for index, item in enumerate(items):
+        try:
+            book = BookCreate.model_validate(item)
+        except ValidationError as error:
+            results[index] = item_result(index, "error", detail=validation_message(error))
+            continue
+        if book.name in pending:
+            results[index] = item_result(index, "error", detail="Duplicate name in request")
+            continue
+        pending[book.name] = (index, book)
+
+    try:
+        author_ids = list({book.author_id for _, book in pending.values()})
+        known_authors = set()
+        for ids in batched(author_ids):
+            rows = await db.execute(select(Author.id).where(Author.id.in_(ids)))
+            known_authors.update(rows.scalars())
+        for name, (index, book) in list(pending.items()):
+            if book.author_id not in known_authors:
+                results[index] = item_result(index, "error", detail="Author does not exist")
+                del pending[name]
+
+        insert_stmt = dialect_insert(db)(Book)
+        if on_conflict == "update":
+            insert_stmt = insert_stmt.on_conflict_do_update(
+                index_elements=[Book.name],
+                set_={
+                    "author_id": insert_stmt.excluded.author_id,
+                    "version": Book.version + 1,
+                },
+            )
+        else:
+            insert_stmt = insert_stmt.on_conflict_do_nothing()
+        insert_stmt = insert_stmt.returning(Book.id, Book.name)
+
+        touched_authors = set()
+        touched_books = []
+        book_counts = Counter()
+        for names in batched(list(pending)):
+            existing = select(Book.id, Book.name, Book.author_id).where(Book.name.in_(names))
+            if on_conflict == "update":
+                # The old authors of updated books lose a book; the rows stay
+                # locked so a concurrent move cannot count the same one.
+                existing = existing.with_for_update()
+            existing = await db.execute(existing)
+            existing = {row.name: row for row in existing}
+            if on_conflict == "update":
+                to_write = names
+            else:
+                to_write = [name for name in names if name not in existing]
+            written = {}
+            if to_write:
+                rows = await db.execute(
+                    insert_stmt,
+                    [pending[name][1].model_dump() for name in to_write],
+                )
+                written = {row.name: row.id for row in rows}
+
+            changes = []
+            for name in names:
+                index, book = pending[name]
+                if name not in written:
+                    book_id = existing[name].id if name in existing else None
+                    results[index] = item_result(index, "existing", book_id)
+                    continue
+                touched_authors.add(book.author_id)
+                book_counts[book.author_id] += 1
+                if name in existing:
+                    touched_authors.add(existing[name].author_id)
+                    book_counts[existing[name].author_id] -= 1
+                    touched_books.append(f"book:{written[name]}")
+                    results[index] = item_result(index, "updated", written[name])
+                    changes.append(change("book", "update", written[name], book.author_id))
+                else:
+                    results[index] = item_result(index, "created", written[name])
+                    changes.append(change("book", "create", written[name], book.author_id))
+            await record_changes(db, *changes)
 
-        db_book = Book(**book.model_dump())
-        db.add(db_book)
+        await change_book_counts(db, book_counts)
         await db.commit()
-        await db.refresh(db_book)
+        if touched_authors:
+            await cache.bump(
+                *touched_books,
+                *stats_names(*touched_authors),
+                *list_namespaces(*touched_authors),
+            )
 
         return {
             "status": "success",
-            "data": BookRead(
-                id=db_book.id, name=db_book.name, author_id=db_book.author_id
-            ).model_dump(),
+            "data": summarize(results),
             "detail": None,
         }
     except Exception:
@@ -127,35 +436,91 @@ async def create_book(book: BookCreate, db: AsyncSession = Depends(get_async_ses
             detail={
                 "status": "error",
                 "data": None,
-                "detail": "Error while creating the book",
+                "detail": "Error while creating the books",
+            },
+        )
+
+
+@router.post("/batch-get", response_model=dict)
+async def batch_get_books(
+    request: Request,
+    batch: BatchGet,
+    db: AsyncSession = Depends(get_read_session),
+    loader: BatchLoader = Depends(get_book_loader),
+):
+    # One IN query for the whole batch, shared with concurrent reads of the
+    # same ids; duplicates are dropped and the first-seen order is kept.
+    ids = list(dict.fromkeys(batch.ids))
+    try:
+        rows = await loader.load_many(db.bind, ids)
+        rows = [row for row in rows if row is not None]
+        return json_response(
+            request,
+            {
+                "status": "success",
+                "data": in_request_order(ids, rows, BOOK_READ_FIELDS),
+                "detail": None,
+            },
+        )
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while fetching books",
             },
         )
 
 
 @router.patch("/{book_id}", response_model=dict)
 async def update_book(
-    book_id: int, book_data: BookUpdate, db: AsyncSession = Depends(get_async_session)
+    book_id: int,
+    book_data: BookUpdate,
+    db: AsyncSession = Depends(get_async_session),
+    cache=Depends(get_cache),
 ):
     try:
+        values = book_data.model_dump(exclude_unset=True)
+        previous_author_id = None
+        if "author_id" in values:
+            # The book may be moving, so the old author's pages go stale too.
+            # Locked until commit, so a concurrent move of the same book
+            # cannot read the same old author and count the move twice.
+            previous_author_id = await db.scalar(
+                select(Book.author_id).where(Book.id == book_id).with_for_update()
+            )
+
         stmt = (
             update(Book)
             .where(Book.id == book_id)
-            .values(**book_data.model_dump(exclude_unset=True))
-            .returning(Book)
+            .values(**values, version=Book.version + 1)
+            .returning(Book.id, Book.name, Book.author_id)
         )
         result = await db.execute(stmt)
-        db_book = result.scalars().first()
+        db_book = result.one_or_none()
 
         if db_book is None:
             raise NoResultFound
 
+        moved = "author_id" in values and previous_author_id != db_book.author_id
+        if moved:
+            if previous_author_id is not None:
+                await db.execute(change_book_count(previous_author_id, -1))
+            if db_book.author_id is not None:
+                await db.execute(change_book_count(db_book.author_id, 1))
+
+        await record_changes(db, change("book", "update", book_id, db_book.author_id))
         await db.commit()
+        await cache.bump(
+            f"book:{book_id}",
+            *stats_names(db_book.author_id, previous_author_id),
+            *list_namespaces(db_book.author_id, previous_author_id),
+        )
 
         return {
             "status": "success",
-            "data": BookRead(
-                id=db_book.id, name=db_book.name, author_id=db_book.author_id
-            ).model_dump(),
+            "data": rows_to_dicts([db_book], BOOK_READ_FIELDS)[0],
             "detail": None,
         }
     except NoResultFound:
@@ -168,8 +533,10 @@ async def update_book(
                 "detail": "Book not found",
             },
         )
-    except Exception:
+    except Exception as error:
         await db.rollback()
+        if isinstance(error, IntegrityError) and is_foreign_key_violation(error):
+            raise author_does_not_exist()
         raise HTTPException(
             status_code=500,
             detail={
@@ -181,15 +548,28 @@ async def update_book(
 
 
 @router.delete("/{book_id}", response_model=dict)
-async def delete_book(book_id: int, db: AsyncSession = Depends(get_async_session)):
+async def delete_book(
+    book_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    cache=Depends(get_cache),
+):
     try:
-        stmt = delete(Book).where(Book.id == book_id)
+        stmt = delete(Book).where(Book.id == book_id).returning(Book.author_id)
         result = await db.execute(stmt)
+        deleted = result.one_or_none()
 
-        if result.rowcount == 0:
+        if deleted is None:
             raise NoResultFound
 
+        if deleted.author_id is not None:
+            await db.execute(change_book_count(deleted.author_id, -1))
+        await record_changes(db, change("book", "delete", book_id, deleted.author_id))
         await db.commit()
+        await cache.bump(
+            f"book:{book_id}",
+            *stats_names(deleted.author_id),
+            *list_namespaces(deleted.author_id),
+        )
 
         return {
             "status": "success",
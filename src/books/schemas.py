@@ -12,7 +12,11 @@ class BookRead(BookBase):
 
     class Config:
         orm_mode = True
-        
+
+
+# Keys of BookRead in response order, for building items straight from rows.
+BOOK_READ_FIELDS = ("id", "name", "author_id")
+
 
 class BookCreate(BookBase):
     pass
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.future import select
+
+from fastapi.requests import HTTPConnection
+
+from changelog import change_to_dict
+from models import Change
+
+logger = logging.getLogger(__name__)
+
+# Fans committed changes out to /events subscribers. Every subscriber has a
+# small bounded queue; publishing never waits, and a subscriber whose queue
+# is full is dropped (it gets None and should resync from GET /changes)
+# instead of making the hub buffer without limit.
+#
+# Changes committed in this process are published straight from the commit
+# hook. Changes committed by other worker processes are picked up by tailing
+# the change table while anyone is subscribed; seq order is commit order
+# (see changelog.before_commit), so a watermark is enough to tail it, and
+# the seqs published recently are remembered so nothing is sent twice.
+
+SEEN_SEQS = 10000
+TAIL_BATCH_SIZE = 1000
+QUEUE_SIZE = 100
+
+
+class Subscriber:
+    def __init__(
+        self,
+        entity: Optional[str] = None,
+        author_id: Optional[int] = None,
+        queue_size: int = QUEUE_SIZE,
+    ):
+        self.entity = entity
+        self.author_id = author_id
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+    def matches(self, change: dict) -> bool:
+        return self.entity is None or change["entity"] == self.entity
+
+    async def get(self) -> Optional[dict]:
+        # The next change, or None once the subscriber has been dropped.
+        return await self.queue.get()
+
+
+class EventHub:
+    def __init__(self, poll_seconds: float, queue_size: int = QUEUE_SIZE):
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        # Keyed by the author_id filter; None holds unfiltered subscribers.
+        self._subscribers: Dict[Optional[int], Set[Subscriber]] = defaultdict(set)
+        self._seen: Set[int] = set()
+        self._seen_order: Deque[int] = deque()
+        self._tail_task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(
+        self, subscriber: Subscriber, bind: Optional[AsyncEngine] = None
+    ) -> Subscriber:
+        self._subscribers[subscriber.author_id].add(subscriber)
+        if bind is not None and self.poll_seconds > 0 and self._tail_task is None:
+            self._tail_task = asyncio.ensure_future(self._tail(bind))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.author_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.author_id]
+
+    async def close(self) -> None:
+        task = self._tail_task
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def publish(self, changes) -> None:
+        for change in changes:
+            if change["seq"] in self._seen:
+                continue
+            self._remember(change["seq"])
+            targets = self._subscribers.get(None, set()) | self._subscribers.get(
+                change["author_id"], set()
+            )
+            for subscriber in targets:
+                if subscriber.matches(change):
+                    self._deliver(subscriber, change)
+
+    def _deliver(self, subscriber: Subscriber, change: dict) -> None:
+        try:
+            subscriber.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop what it has not read yet and wake it
+            # with None so it can close the connection.
+            self.unsubscribe(subscriber)
+            subscriber.dropped = True
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def _remember(self, seq: int) -> None:
+        self._seen.add(seq)
+        self._seen_order.append(seq)
+        if len(self._seen_order) > SEEN_SEQS:
+            self._seen.discard(self._seen_order.popleft())
+
+    async def _tail(self, bind: AsyncEngine) -> None:
+        try:
+            async with AsyncSession(bind) as session:
+                latest = select(func.max(Change.seq))
+                watermark = await session.scalar(latest) or 0
+                while self.subscriber_count:
+                    await session.rollback()
+                    await asyncio.sleep(self.poll_seconds)
+                    stmt = (
+                        select(
+                            Change.seq,
+                            Change.entity,
+                            Change.op,
+                            Change.entity_id,
+                            Change.author_id,
+                            Change.changed_at,
+                        )
+                        .where(Change.seq > watermark)
+                        .order_by(Change.seq)
+                        .limit(TAIL_BATCH_SIZE)
+                    )
+                    rows = (await session.execute(stmt)).all()
+                    if rows:
+                        watermark = rows[-1].seq
+                        self.publish([change_to_dict(row) for row in rows])
+        except Exception:
+            logger.exception("Tailing the change table failed")
+        finally:
+            self._tail_task = None
+
+
+def get_hub(connection: HTTPConnection) -> EventHub:
+    # Created by the app's lifespan, which also hooks it up to commits.
+    return connection.app.state.hub
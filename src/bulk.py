@@ -0,0 +1,83 @@
+import json
+from typing import Iterator, List, Optional, Sequence
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from responses import rows_to_dicts
+
+BATCH_SIZE = 1000
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class BatchGet(BaseModel):
+    # Capped so a batch always resolves in a single IN query.
+    ids: List[int] = Field(max_length=BATCH_SIZE)
+
+
+async def read_items(request: Request) -> list:
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith(NDJSON_CONTENT_TYPES):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+        if not isinstance(items, list):
+            raise ValueError
+        return items
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Expected a JSON array or NDJSON lines",
+            },
+        )
+
+
+def dialect_insert(db: AsyncSession):
+    # ON CONFLICT is dialect specific, so pick the insert() of the bound engine.
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def batched(values: Sequence, size: int = BATCH_SIZE) -> Iterator[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def item_result(
+    index: int, status: str, id: Optional[int] = None, detail: Optional[str] = None
+) -> dict:
+    return {"index": index, "status": status, "id": id, "detail": detail}
+
+
+def validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+def summarize(results: List[dict]) -> dict:
+    summary = {"created": 0, "updated": 0, "existing": 0, "failed": 0}
+    for result in results:
+        if result["status"] == "error":
+            summary["failed"] += 1
+        else:
+            summary[result["status"]] += 1
+    return {**summary, "items": results}
+
+
+def in_request_order(ids: Sequence[int], rows, fields: Sequence[str]) -> dict:
+    # Rows come back in whatever order the IN lookup produced them.
+    by_id = {row.id: row for row in rows}
+    return {
+        "items": rows_to_dicts([by_id[id] for id in ids if id in by_id], fields),
+        "missing": [id for id in ids if id not in by_id],
+    }
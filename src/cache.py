@@ -0,0 +1,192 @@
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi.requests import HTTPConnection
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import Settings
+from database import from_replica, wrote_recently
+
+logger = logging.getLogger(__name__)
+
+# Entries embed a generation number in their key: one per list and one per
+# single item. Bumping the generation makes every cached page of that list
+# (or the item) unreachable without scanning for keys, which works the same
+# way for the in-process and the Redis backend. Because the generation is
+# read before the query, a read that raced with a write can only store what
+# it read under the old generation, where nobody looks any more.
+
+
+class NullCache:
+    async def get(self, key: str) -> Optional[Any]:
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    async def generation(self, name: str) -> int:
+        return 0
+
+    async def bump(self, *names: str) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryCache:
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Generations live outside the entry LRU so that evicting an entry
+        # can never reset one and resurrect pages cached under an older
+        # number. Every written item has one, so they are bounded as well:
+        # values come from one counter, and when the least recently bumped
+        # generation is dropped, every name without one moves to a fresh
+        # floor value that no entry can have been stored under.
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._counter = itertools.count(1)
+        self._floor = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def generation(self, name: str) -> int:
+        return self._generations.get(name, self._floor)
+
+    async def bump(self, *names: str) -> None:
+        for name in names:
+            self._generations[name] = next(self._counter)
+            self._generations.move_to_end(name)
+        while len(self._generations) > self.max_entries:
+            self._generations.popitem(last=False)
+            self._floor = next(self._counter)
+
+    async def close(self) -> None:
+        self._entries.clear()
+
+
+class RedisCache:
+    # Works with any client exposing the redis.asyncio get/set/delete/incr API.
+    def __init__(self, client, ttl: float, prefix: str = "test_project:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = await self.client.get(self.prefix + key)
+        except Exception:
+            logger.warning("Cache read failed for %s", key, exc_info=True)
+            return None
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any) -> None:
+        try:
+            await self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl))
+        except Exception:
+            logger.warning("Cache write failed for %s", key, exc_info=True)
+
+    async def delete(self, *keys: str) -> None:
+        try:
+            await self.client.delete(*(self.prefix + key for key in keys))
+        except Exception:
+            logger.warning("Cache delete failed for %s", keys, exc_info=True)
+
+    async def generation(self, name: str) -> int:
+        try:
+            raw = await self.client.get(f"{self.prefix}gen:{name}")
+        except Exception:
+            logger.warning("Cache read failed for generation %s", name, exc_info=True)
+            return 0
+        return int(raw or 0)
+
+    async def bump(self, *names: str) -> None:
+        for name in names:
+            try:
+                await self.client.incr(f"{self.prefix}gen:{name}")
+            except Exception:
+                logger.warning("Cache bump failed for %s", name, exc_info=True)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def create_cache(settings: Settings):
+    url = settings.cache_url
+    if url == "none" or settings.cache_ttl <= 0:
+        return NullCache()
+    if url.startswith("memory://"):
+        return MemoryCache(settings.cache_ttl, settings.cache_max_entries)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL points to Redis but the redis package is not installed")
+        return RedisCache(redis.Redis.from_url(url), settings.cache_ttl)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+def get_cache(connection: HTTPConnection):
+    # Created by the app's lifespan from the app's settings (see main.create_app).
+    return connection.app.state.cache
+
+
+async def list_key(cache, namespace: str, *params) -> str:
+    generation = await cache.generation(namespace)
+    return ":".join([namespace, str(generation), *map(str, params)])
+
+
+async def item_key(cache, name: str) -> str:
+    # The key of a single item, e.g. "book:1".
+    generation = await cache.generation(name)
+    return f"{name}:{generation}"
+
+
+async def lookup(cache, connection: HTTPConnection, key: str) -> Any:
+    # A client inside its read-your-writes window reads from the primary
+    # (see database.get_read_session), so it skips the cache as well.
+    if wrote_recently(connection):
+        return None
+    return await cache.get(key)
+
+
+async def store(cache, db: AsyncSession, key: str, value: Any) -> None:
+    # Replicas may lag, and a row read from one after a write has bumped the
+    # generation would be cached under the new generation. Only what was
+    # read from the primary is cached.
+    if not from_replica(db):
+        await cache.set(key, value)
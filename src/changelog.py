@@ -0,0 +1,123 @@
+import asyncio
+from typing import Callable, List, Optional
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Change
+
+# Every write handler appends its changes to the change table in the same
+# transaction as the write itself, so the feed has an entry for a row
+# exactly when the row change was committed. Once the session commits, the
+# in-process listeners (long-polling /changes requests and the hooks below)
+# are woken up; a rollback discards the pending entries.
+
+QUEUED = "changelog.queued"
+PENDING = "changelog.pending"
+
+# Any 64-bit key works; it only has to be the same for every writer.
+CHANGE_LOG_LOCK = 0x63686E67
+
+# Called after commit with the list of committed change dicts.
+commit_hooks: List[Callable[[List[dict]], None]] = []
+
+
+def change(
+    entity: str, op: str, entity_id: int, author_id: Optional[int] = None
+) -> dict:
+    return {"entity": entity, "op": op, "entity_id": entity_id, "author_id": author_id}
+
+
+async def record_changes(db: AsyncSession, *changes: dict) -> None:
+    # The entries are only inserted when the session commits, see
+    # before_commit below.
+    if changes:
+        db.info.setdefault(QUEUED, []).extend(changes)
+
+
+def change_to_dict(row) -> dict:
+    return {
+        "seq": row.seq,
+        "entity": row.entity,
+        "op": row.op,
+        "entity_id": row.entity_id,
+        "author_id": row.author_id,
+        "changed_at": row.changed_at.isoformat() if row.changed_at else None,
+    }
+
+
+class ChangeSignal:
+    # Wakes every waiter at once. A waiter takes the current event with
+    # listen() before it looks for changes and then waits on that event, so
+    # a commit that lands in between still wakes it. The event is created
+    # inside the running loop, and replaced when it belongs to a loop that
+    # is gone (e.g. between tests).
+    def __init__(self):
+        self._event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def listen(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._event is None or self._loop is not loop:
+            self._event = asyncio.Event()
+            self._loop = loop
+        return self._event
+
+    def notify(self) -> None:
+        if self._event is not None:
+            self._event.set()
+            self._event = None
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+signal = ChangeSignal()
+
+
+@event.listens_for(Session, "before_commit")
+def before_commit(session: Session) -> None:
+    changes = session.info.pop(QUEUED, None)
+    if not changes:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        # Sequence numbers are handed out before commit, so two concurrent
+        # transactions could commit out of order and a consumer that already
+        # read the higher number would skip the lower one. Holding this lock
+        # until commit makes seq order and commit order the same. The
+        # entries are inserted here rather than by record_changes, so the
+        # lock is held for this insert and the commit only, not for the
+        # whole write. Committing writes still take it one at a time across
+        # the cluster. SQLite writers are serialized anyway.
+        session.execute(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK)))
+    stmt = insert(Change).returning(
+        Change.seq,
+        Change.entity,
+        Change.op,
+        Change.entity_id,
+        Change.author_id,
+        Change.changed_at,
+    )
+    rows = session.execute(stmt, changes)
+    session.info.setdefault(PENDING, []).extend(change_to_dict(row) for row in rows)
+
+
+@event.listens_for(Session, "after_commit")
+def after_commit(session: Session) -> None:
+    changes = session.info.pop(PENDING, None)
+    if not changes:
+        return
+    signal.notify()
+    for hook in commit_hooks:
+        hook(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def after_rollback(session: Session) -> None:
+    session.info.pop(QUEUED, None)
+    session.info.pop(PENDING, None)
@@ -0,0 +1,70 @@
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from changelog import change_to_dict, signal
+from database import get_read_session
+from models import Change
+
+router = APIRouter()
+
+MAX_WAIT_SECONDS = 30
+
+
+@router.get("", response_model=dict)
+async def get_changes(
+    request: Request,
+    since: int = 0,
+    limit: int = 100,
+    wait: float = 0,
+    db: AsyncSession = Depends(get_read_session),
+):
+    # Entries after seq `since`, oldest first. With wait > 0 an empty result
+    # is held open for up to that many seconds until something changes.
+    # Consumers pass next_since back as since to get only what is new.
+    deadline = time.monotonic() + min(max(wait, 0), MAX_WAIT_SECONDS)
+    # Writes made by other worker processes do not wake this one, so waiting
+    # requests also look again at this interval, like the /events tail.
+    poll_seconds = request.app.state.settings.event_poll_seconds
+    stmt = (
+        select(
+            Change.seq,
+            Change.entity,
+            Change.op,
+            Change.entity_id,
+            Change.author_id,
+            Change.changed_at,
+        )
+        .where(Change.seq > since)
+        .order_by(Change.seq)
+        .limit(limit)
+    )
+    try:
+        while True:
+            changed = signal.listen()
+            changes = (await db.execute(stmt)).all()
+            # Ends the read transaction, so the connection goes back to the
+            # pool while waiting and the next poll sees a fresh snapshot.
+            await db.rollback()
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                break
+            await signal.wait(changed, min(remaining, poll_seconds or remaining))
+
+        return {
+            "status": "success",
+            "data": [change_to_dict(change) for change in changes],
+            "detail": None,
+            "next_since": changes[-1].seq if changes else since,
+        }
+    except Exception:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Error while fetching changes",
+            },
+        )
@@ -1,7 +1,85 @@
-from dotenv import load_dotenv
 import os
+from typing import Any, Dict, List, Literal, Optional
 
-load_dotenv()
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
-DATABASE_URL = os.environ.get("DATABASE_URL")
-DATABASE_URL_TEST = os.environ.get("DATABASE_URL_TEST")
\ No newline at end of file
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
+
+
+class Settings(BaseSettings):
+    # Every field can be set from the environment or .env using its upper-case
+    # name, e.g. DB_POOL_SIZE=20 or DB_CONNECT_ARGS='{"timeout": 10}'. The
+    # environment wins over .env, which is read when Settings is created
+    # rather than copied into os.environ.
+    model_config = SettingsConfigDict(env_file=ENV_FILE, extra="ignore")
+
+    database_url: Optional[str] = None
+    database_url_test: Optional[str] = None
+
+    # GET endpoints read from the replicas when any are given, e.g.
+    # DATABASE_REPLICA_URLS='["postgresql+asyncpg://replica1/app"]'. After a
+    # write the same client reads from the primary for read_your_writes_seconds.
+    database_replica_urls: List[str] = []
+    replica_strategy: Literal["round_robin", "least_connections"] = "round_robin"
+    read_your_writes_seconds: float = 5
+
+    # Pool sizing only applies to pooled engines, not to in-memory SQLite.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    # Connections all worker processes together may open to each database.
+    # When set, every worker's pool_size + max_overflow is its share of the
+    # budget; web_concurrency is the number of workers (see src/serve.py).
+    db_connection_budget: Optional[int] = None
+    web_concurrency: Optional[int] = None
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    # Open pool_size connections per pool at startup instead of on first use.
+    db_pool_warm: bool = True
+    db_echo: bool = False
+    db_connect_args: Dict[str, Any] = {}
+    # Prepared statement cache of the driver (sqlite3 / asyncpg) and the
+    # compiled SQL cache of SQLAlchemy.
+    db_statement_cache_size: Optional[int] = None
+    db_query_cache_size: int = 500
+
+    # File-backed SQLite runs in WAL mode with these pragmas. Writes go through
+    # one dedicated connection and reads through a pool of read-only ones.
+    sqlite_production_mode: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_read_pool_size: int = 4
+
+    # Every request reports its query count and DB time in a Server-Timing
+    # header; requests slower than this are logged with their slowest queries.
+    query_profiling: bool = True
+    slow_request_ms: float = 500
+    profile_slowest_statements: int = 3
+
+    # Encoder used for API responses; falls back to the stdlib when the
+    # selected package is not installed.
+    json_response: Literal["orjson", "ujson", "json"] = "orjson"
+
+    # Single-row and batch reads arriving within this window share one IN
+    # query; 0 still merges everything requested in the same loop iteration.
+    coalesce_window_ms: float = 0
+
+    # /events subscribers that fall event_queue_size changes behind are
+    # disconnected. Changes committed by other worker processes reach them
+    # by tailing the change table every event_poll_seconds (0 disables).
+    event_queue_size: int = 100
+    event_poll_seconds: float = 1
+
+    # "memory://" keeps an LRU in each process, "redis://host:port/db" shares
+    # one across workers and "none" turns caching off.
+    cache_url: str = "memory://"
+    cache_ttl: int = 60
+    cache_max_entries: int = 10000
+
+
+settings = Settings()
+
+DATABASE_URL = settings.database_url
+DATABASE_URL_TEST = settings.database_url_test
@@ -1,18 +1,294 @@
-from typing import AsyncGenerator
-from sqlalchemy import MetaData
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, List, Optional, Tuple
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from fastapi import Request, Response
+from fastapi.requests import HTTPConnection
+from sqlalchemy import MetaData, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-from config import DATABASE_URL
+from config import Settings
+from metrics import pool_checkout_wait
 
 
+def is_sqlite_file(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
 
-engine = create_async_engine(DATABASE_URL)
-async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(
+                time.perf_counter() - started, pool=self.logging_name or "default"
+            )
 
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+def engine_options(
+    url: str,
+    settings: Settings,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    name: str = "primary",
+) -> dict:
+    url = make_url(url)
+    connect_args = dict(settings.db_connect_args)
+    if settings.db_statement_cache_size is not None:
+        if url.get_backend_name() == "sqlite":
+            connect_args.setdefault("cached_statements", settings.db_statement_cache_size)
+        elif url.get_driver_name() == "asyncpg":
+            connect_args.setdefault("statement_cache_size", settings.db_statement_cache_size)
+
+    options = {
+        "echo": settings.db_echo,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+        "query_cache_size": settings.db_query_cache_size,
+        "connect_args": connect_args,
+    }
+    if settings.db_connection_budget is not None and pool_size is None and max_overflow is None:
+        share = max(1, settings.db_connection_budget // (settings.web_concurrency or 1))
+        pool_size = min(settings.db_pool_size, share)
+        # The budget only ever lowers the configured sizes.
+        max_overflow = min(settings.db_max_overflow, share - pool_size)
+    # In-memory SQLite keeps the dialect's single shared connection. Everything
+    # else gets a sized queue pool; aiosqlite would otherwise open a new
+    # connection and thread for every session.
+    if url.get_backend_name() != "sqlite" or is_sqlite_file(url):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_logging_name=name,
+            pool_size=settings.db_pool_size if pool_size is None else pool_size,
+            max_overflow=settings.db_max_overflow if max_overflow is None else max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+    return options
+
+
+def set_sqlite_pragmas(
+    engine: AsyncEngine, settings: Settings, read_only: bool = False
+) -> None:
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def enable_foreign_keys(engine: AsyncEngine) -> None:
+    # SQLite ignores FOREIGN KEY clauses unless this is set on every
+    # connection; writes rely on it instead of checking the parent first.
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def is_foreign_key_violation(error: IntegrityError) -> bool:
+    # asyncpg reports the SQLSTATE, sqlite3 only a message.
+    if getattr(error.orig, "sqlstate", None) == "23503":
+        return True
+    return "FOREIGN KEY constraint failed" in str(error.orig)
+
+
+def create_engines(url: str, settings: Settings) -> Tuple[AsyncEngine, AsyncEngine]:
+    if not (settings.sqlite_production_mode and is_sqlite_file(url)):
+        engine = create_async_engine(url, **engine_options(url, settings))
+        if make_url(url).get_backend_name() == "sqlite":
+            enable_foreign_keys(engine)
+        return engine, engine
+
+    # SQLite allows one writer at a time. A pool of exactly one connection
+    # turns concurrent write transactions into a FIFO queue inside the process
+    # instead of "database is locked" errors, while WAL lets the read-only
+    # pool keep serving from the last committed snapshot.
+    writer = create_async_engine(
+        url, **engine_options(url, settings, pool_size=1, max_overflow=0)
+    )
+    set_sqlite_pragmas(writer, settings)
+    enable_foreign_keys(writer)
+    reader = create_async_engine(
+        url,
+        **engine_options(
+            url,
+            settings,
+            pool_size=settings.sqlite_read_pool_size,
+            max_overflow=0,
+            name="reader",
+        ),
+    )
+    set_sqlite_pragmas(reader, settings, read_only=True)
+    return writer, reader
+
+
+def create_replica_engine(
+    url: str, settings: Settings, name: str = "replica"
+) -> AsyncEngine:
+    replica = create_async_engine(url, **engine_options(url, settings, name=name))
+    if settings.sqlite_production_mode and is_sqlite_file(url):
+        set_sqlite_pragmas(replica, settings, read_only=True)
+    return replica
+
+
+class ReadRouter:
+    def __init__(self, engines: List[AsyncEngine], strategy: str = "round_robin"):
+        self.engines = engines
+        self.strategy = strategy
+        self.session_makers = [
+            sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+            for engine in engines
+        ]
+        self.active = [0] * len(engines)
+        self._counter = itertools.count()
+
+    def choose(self) -> int:
+        if self.strategy == "least_connections":
+            return min(range(len(self.engines)), key=self.active.__getitem__)
+        return next(self._counter) % len(self.engines)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncGenerator[AsyncSession, None]:
+        index = self.choose()
+        self.active[index] += 1
+        try:
+            async with self.session_makers[index]() as session:
+                yield session
+        finally:
+            self.active[index] -= 1
+
+
+READ_YOUR_WRITES_COOKIE = "read_primary_until"
+# Set in session.info of sessions bound to a replica.
+REPLICA = "replica"
+
+
+def mark_recent_write(response: Response, seconds: float) -> None:
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        str(time.time() + seconds),
+        max_age=max(1, int(seconds)),
+        httponly=True,
+    )
+
+
+def wrote_recently(request: HTTPConnection) -> bool:
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def from_replica(session: AsyncSession) -> bool:
+    return session.info.get(REPLICA, False)
+
+
+def pool_status(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return status
+
+
+class Database:
+    # The engines, session makers and read router of one running app. Created
+    # by the app's lifespan (see main.create_app), so nothing connects at
+    # import time and every worker process builds its own pools after fork.
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.engine, self.read_engine = create_engines(settings.database_url, settings)
+        self.session_maker = sessionmaker(
+            self.engine, class_=AsyncSession, expire_on_commit=False
+        )
+        self.read_session_maker = sessionmaker(
+            self.read_engine, class_=AsyncSession, expire_on_commit=False
+        )
+        self.replica_engines = [
+            create_replica_engine(url, settings, name=f"replica{index}")
+            for index, url in enumerate(settings.database_replica_urls)
+        ]
+        self.read_router = (
+            ReadRouter(self.replica_engines, settings.replica_strategy)
+            if self.replica_engines
+            else None
+        )
+
+    @property
+    def engines(self) -> List[AsyncEngine]:
+        engines = [self.engine]
+        if self.read_engine is not self.engine:
+            engines.append(self.read_engine)
+        return engines + self.replica_engines
+
+    async def warm(self) -> None:
+        # Opens every pool's steady-state connections up front, so the first
+        # requests after a deploy do not pay for connecting (and, on SQLite,
+        # for the pragmas) one by one.
+        await asyncio.gather(*(warm_pool(engine) for engine in self.engines))
+
+    async def dispose(self) -> None:
+        await asyncio.gather(*(engine.dispose() for engine in self.engines))
+
+
+async def warm_pool(engine: AsyncEngine) -> None:
+    pool = engine.pool
+    size = pool.size() if isinstance(pool, QueuePool) else 1
+    connections = await asyncio.gather(*(engine.connect() for _ in range(size)))
+    for connection in connections:
+        await connection.close()
+
+
+def get_database(connection: HTTPConnection) -> Database:
+    return connection.app.state.database
+
+
+async def get_async_session(
+    request: Request, response: Response
+) -> AsyncGenerator[AsyncSession, None]:
+    database = get_database(request)
+    if database.read_router is not None and database.settings.read_your_writes_seconds > 0:
+        mark_recent_write(response, database.settings.read_your_writes_seconds)
+    async with database.session_maker() as session:
+        yield session
+
+
+async def get_read_session(
+    request: HTTPConnection,
+) -> AsyncGenerator[AsyncSession, None]:
+    # HTTPConnection rather than Request, so WebSocket routes can use it too.
+    # Replicas may lag, so a client that has just written keeps reading from
+    # the primary until its read-your-writes window is over.
+    database = get_database(request)
+    if database.read_router is None or wrote_recently(request):
+        async with database.read_session_maker() as session:
+            yield session
+    else:
+        async with database.read_router.session() as session:
+            session.info[REPLICA] = True
+            yield session
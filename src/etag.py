@@ -0,0 +1,44 @@
+import hashlib
+from typing import Iterable, Optional, Sequence, Union
+
+from fastapi import Request, Response
+
+from responses import json_response
+
+
+def resource_etag(kind: str, id: int, version: Union[int, str]) -> str:
+    return f'"{kind}-{id}-{version}"'
+
+
+def page_etag(
+    rows: Iterable, next_cursor: Optional[str], fields: Sequence[str] = ("version",)
+) -> str:
+    # A page changes exactly when one of its rows gains a version, a row
+    # enters or leaves it, or it gains or loses a following page. Pages that
+    # show columns not covered by the version pass them in fields.
+    digest = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        values = ":".join(str(getattr(row, field)) for field in fields)
+        digest.update(f"{row.id}:{values},".encode())
+    digest.update((next_cursor or "").encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in header.split(","))
+    return etag in (candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def conditional_response(request: Request, etag: str, body: dict) -> Response:
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return json_response(request, body, etag)
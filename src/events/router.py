@@ -0,0 +1,104 @@
+import asyncio
+import json
+from typing import AsyncIterator, Awaitable, Callable, Literal, Optional
+
+from fastapi import APIRouter, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from broadcast import EventHub, Subscriber, get_hub
+from database import Database, get_database
+
+router = APIRouter()
+
+KEEPALIVE_SECONDS = 15
+# Close code for subscribers dropped for falling behind; in the 4000-4999
+# range left to applications.
+SLOW_CONSUMER_CLOSE_CODE = 4008
+
+Entity = Literal["author", "book"]
+
+
+async def sse_events(
+    hub: EventHub,
+    subscriber: Subscriber,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    keepalive: float = KEEPALIVE_SECONDS,
+) -> AsyncIterator[str]:
+    # Each change is sent with its seq as the event id, so a client can
+    # catch up from GET /changes?since=<last id> after reconnecting.
+    try:
+        yield ": connected\n\n"
+        while True:
+            try:
+                change = await asyncio.wait_for(subscriber.get(), keepalive)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if change is None:
+                yield "event: dropped\ndata: {}\n\n"
+                return
+            yield f"id: {change['seq']}\nevent: change\ndata: {json.dumps(change)}\n\n"
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    entity: Optional[Entity] = None,
+    author_id: Optional[int] = None,
+    database: Database = Depends(get_database),
+    hub: EventHub = Depends(get_hub),
+):
+    # Only the engine to tail the change table from is needed. A session
+    # dependency would stay open, and on a replica count as busy, for as
+    # long as the stream lasts.
+    subscriber = hub.subscribe(
+        Subscriber(entity, author_id, hub.queue_size), bind=database.read_engine
+    )
+    return StreamingResponse(
+        sse_events(hub, subscriber, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def websocket_events(
+    websocket: WebSocket,
+    entity: Optional[Entity] = None,
+    author_id: Optional[int] = None,
+    database: Database = Depends(get_database),
+    hub: EventHub = Depends(get_hub),
+):
+    await websocket.accept()
+    subscriber = hub.subscribe(
+        Subscriber(entity, author_id, hub.queue_size), bind=database.read_engine
+    )
+    # Listening for the client's close frame alongside the queue frees the
+    # subscriber as soon as the client goes away, not at the next change.
+    receiving = asyncio.ensure_future(websocket.receive())
+    try:
+        while True:
+            getting = asyncio.ensure_future(subscriber.get())
+            done, _ = await asyncio.wait(
+                {getting, receiving}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiving in done:
+                getting.cancel()
+                if receiving.result()["type"] == "websocket.disconnect":
+                    return
+                receiving = asyncio.ensure_future(websocket.receive())
+                continue
+            change = getting.result()
+            if change is None:
+                await websocket.close(SLOW_CONSUMER_CLOSE_CODE, "Too slow")
+                return
+            await websocket.send_json(change)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiving.cancel()
+        hub.unsubscribe(subscriber)
@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Literal, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+EXPORT_CHUNK_SIZE = 1000
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def stream_rows(
+    db: AsyncSession, stmt, columns: Sequence[str], format: ExportFormat
+) -> AsyncIterator[bytes]:
+    # yield_per makes the driver use a server-side cursor, so only one chunk
+    # of rows is held in memory however large the table is.
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        async for rows in result.partitions():
+            writer.writerows(rows)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    else:
+        async for rows in result.partitions():
+            yield "".join(
+                json.dumps(dict(zip(columns, row))) + "\n" for row in rows
+            ).encode()
+
+
+def export_response(
+    db: AsyncSession, stmt, columns: Sequence[str], format: ExportFormat, filename: str
+) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(db, stmt, columns, format),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{format}"'
+        },
+    )
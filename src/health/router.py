@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Request
+
+from database import get_database, pool_status
+
+router = APIRouter()
+
+
+@router.get("/pool", response_model=dict)
+async def get_pool_status(request: Request):
+    database = get_database(request)
+    return {
+        "status": "success",
+        "data": {
+            "primary": pool_status(database.engine),
+            "readers": pool_status(database.read_engine),
+            "replicas": [pool_status(replica) for replica in database.replica_engines],
+        },
+        "detail": None,
+    }
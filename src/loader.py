@@ -0,0 +1,120 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi.requests import HTTPConnection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from bulk import batched
+
+# Concurrent reads of the same rows share one query. Ids requested within
+# window_ms of each other are fetched together with a single IN query, and
+# ids that are already being fetched join that query instead of starting a
+# new one, so a burst of requests for a hot row costs one database hit.
+#
+# Every commit that records changes moves the loaders of the app to a new
+# write epoch (see main.create_app), and reads only share queries started
+# in the same epoch. So a read that arrives after a write never joins a
+# query that started before it and returns the old row, whatever the cache
+# backend is. Writes to any row start a new epoch; telling them apart is
+# not worth it for how briefly a query is in flight.
+#
+# The query runs in a session of its own rather than in any request's
+# session: the result is shared, so it must not depend on the request that
+# happened to start it still being around.
+
+Fetch = Callable[[AsyncSession, Sequence[int]], Awaitable[Iterable]]
+Key = Tuple[int, int]
+
+
+class BatchLoader:
+    def __init__(self, fetch: Fetch, window_ms: float = 0):
+        self.fetch = fetch
+        self.window = window_ms / 1000
+        self.epoch = 0
+        # Per engine, so reads routed to different replicas are not merged,
+        # and keyed by (id, epoch).
+        self._pending: Dict[AsyncEngine, Dict[Key, asyncio.Future]] = {}
+        self._in_flight: Dict[AsyncEngine, Dict[Key, asyncio.Future]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def invalidate(self) -> None:
+        # Called after a write commits: later loads start their own query.
+        self.epoch += 1
+
+    async def load(self, bind: AsyncEngine, id: int):
+        # The row with this id, or None when there is none.
+        return (await self.load_many(bind, [id]))[0]
+
+    async def load_many(self, bind: AsyncEngine, ids: Sequence[int]) -> List:
+        futures = [self._future(bind, (id, self.epoch)) for id in ids]
+        # Shielded so a client that disconnects does not cancel the query
+        # for everyone else waiting on it.
+        return [await asyncio.shield(future) for future in futures]
+
+    def _future(self, bind: AsyncEngine, key: Key) -> asyncio.Future:
+        future = self._in_flight.get(bind, {}).get(key)
+        if future is not None:
+            return future
+
+        pending = self._pending.get(bind)
+        if pending is None:
+            pending = self._pending[bind] = {}
+            loop = asyncio.get_running_loop()
+            loop.call_later(self.window, self._dispatch, bind)
+        future = pending.get(key)
+        if future is None:
+            future = pending[key] = asyncio.get_running_loop().create_future()
+        return future
+
+    def _dispatch(self, bind: AsyncEngine) -> None:
+        batch = self._pending.pop(bind)
+        self._in_flight.setdefault(bind, {}).update(batch)
+        task = asyncio.ensure_future(self._run(bind, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, bind: AsyncEngine, batch: Dict[Key, asyncio.Future]) -> None:
+        try:
+            rows = {}
+            ids = list({id for id, _ in batch})
+            async with AsyncSession(bind) as session:
+                for chunk in batched(ids):
+                    rows.update((row.id, row) for row in await self.fetch(session, chunk))
+        except Exception as error:
+            self._settle(bind, batch, error=error)
+        else:
+            self._settle(bind, batch, rows=rows)
+
+    def _settle(
+        self,
+        bind: AsyncEngine,
+        batch: Dict[Key, asyncio.Future],
+        rows: Optional[dict] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        in_flight = self._in_flight[bind]
+        for key, future in batch.items():
+            if in_flight.get(key) is future:
+                del in_flight[key]
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(rows.get(key[0]))
+        if not in_flight:
+            del self._in_flight[bind]
+
+
+def loader_dependency(fetch: Fetch) -> Callable[[HTTPConnection], BatchLoader]:
+    # A dependency returning the app's loader for fetch, created on first use
+    # with the app's coalescing window; loaders are never shared between apps.
+    def get_loader(connection: HTTPConnection) -> BatchLoader:
+        loaders = connection.app.state.loaders
+        loader = loaders.get(fetch)
+        if loader is None:
+            window_ms = connection.app.state.settings.coalesce_window_ms
+            loader = loaders[fetch] = BatchLoader(fetch, window_ms)
+        return loader
+
+    return get_loader
@@ -1,19 +1,112 @@
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI
 
 from authors.router import router as authors_router
 from books.router import router as books_router
+from broadcast import EventHub
+from cache import create_cache
+from changelog import commit_hooks
+from changes.router import router as changes_router
+from config import Settings, settings as default_settings
+from database import Database
+from events.router import router as events_router
+from health.router import router as health_router
+from metrics import MetricsMiddleware, router as metrics_router
+from responses import response_class, timed
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    # Building the app only wires routes and middleware. Engines, pools, the
+    # cache and the event hub are created by the lifespan, i.e. in each worker
+    # process once it has started, and closed again on shutdown. Everything
+    # the app uses lives on app.state, so apps built with different settings
+    # do not share any of it.
+    settings = settings or default_settings
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Each part is closed again on shutdown, and also when a later step
+        # of startup fails, e.g. warming the pools while the database is
+        # down, in reverse order.
+        async with AsyncExitStack() as stack:
+            database = Database(settings)
+            stack.push_async_callback(database.dispose)
+            if settings.query_profiling:
+                from profiling import instrument_engine
+
+                for engine in database.engines:
+                    instrument_engine(engine)
+            if settings.db_pool_warm:
+                await database.warm()
+            hub = EventHub(settings.event_poll_seconds, settings.event_queue_size)
+            stack.push_async_callback(hub.close)
+            cache = create_cache(settings)
+            stack.push_async_callback(cache.close)
+            app.state.database = database
+            app.state.cache = cache
+            app.state.hub = hub
+            app.state.loaders = {}
+
+            def invalidate_loaders(changes):
+                for loader in app.state.loaders.values():
+                    loader.invalidate()
+
+            for hook in (hub.publish, invalidate_loaders):
+                commit_hooks.append(hook)
+                stack.callback(commit_hooks.remove, hook)
+            yield
+
+    json_response_class = timed(response_class(settings.json_response))
+    app = FastAPI(
+        title="test_project", default_response_class=json_response_class, lifespan=lifespan
+    )
+    app.state.settings = settings
+    app.state.response_class = json_response_class
+
+    if settings.query_profiling:
+        from profiling import QueryProfilingMiddleware
+
+        app.add_middleware(
+            QueryProfilingMiddleware,
+            slow_request_ms=settings.slow_request_ms,
+            slowest_statements=settings.profile_slowest_statements,
+        )
+    app.add_middleware(MetricsMiddleware)
+
+    app.include_router(
+        authors_router,
+        prefix="/authors",
+        tags=["Authors"],
+    )
+
+    app.include_router(
+        books_router,
+        prefix="/books",
+        tags=["Books"],
+    )
+
+    app.include_router(
+        changes_router,
+        prefix="/changes",
+        tags=["Changes"],
+    )
+
+    app.include_router(
+        events_router,
+        prefix="/events",
+        tags=["Events"],
+    )
 
+    app.include_router(
+        health_router,
+        prefix="/health",
+        tags=["Health"],
+    )
 
-app = FastAPI(title="test_project")
+    app.include_router(metrics_router)
+    return app
 
-app.include_router(
-    authors_router,
-    prefix="/authors",
-    tags=["Authors"],
-)
 
-app.include_router(
-    books_router,
-    prefix="/books",
-    tags=["Books"],
-)
+app = create_app()
@@ -1,7 +1,19 @@
-from sqlalchemy import Column, Integer, MetaData, String, ForeignKey, UniqueConstraint
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.ext.declarative import DeclarativeMeta, declarative_base
 from sqlalchemy.orm import relationship
 
+import search
+
 Base: DeclarativeMeta = declarative_base()
 metadata: MetaData = Base.metadata
 
@@ -11,13 +23,22 @@ class Author(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False, unique=True)
+    # Bumped by every update; ETags are derived from it.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Maintained by the book write handlers in the same transaction as the
+    # book change, so rankings never have to COUNT the book table.
+    book_count = Column(Integer, nullable=False, default=0, server_default="0")
 
-    books = relationship("Book", back_populates="author", lazy="joined")
+    # Relationships are never loaded implicitly; queries that need them opt in
+    # with a loader option such as selectinload(Author.books).
+    books = relationship("Book", back_populates="author", lazy="raise")
 
     __table_args__ = (
         UniqueConstraint(
             "name", name="uq_author_name"
         ),
+        Index("ix_author_name_lower", func.lower(name)),
+        Index("ix_author_book_count_id", book_count, id),
     )
 
 
@@ -27,11 +48,38 @@ class Book(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False, unique=True)
     author_id = Column(Integer, ForeignKey("author.id"))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
-    author = relationship("Author", back_populates="books", lazy="joined")
+    author = relationship("Author", back_populates="books", lazy="raise")
 
     __table_args__ = (
         UniqueConstraint(
             "name", "author_id", name="uq_book_name_author_id"
         ),
+        # Serves both ?author_id= lookups and keyset pages within an author;
+        # ForeignKey() alone does not create an index.
+        Index("ix_book_author_id_id", author_id, id),
+        Index("ix_book_name_lower", func.lower(name)),
     )
+
+
+class Change(Base):
+    # Append-only log of author and book writes behind GET /changes.
+    __tablename__ = "change"
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    op = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    # The author the changed row belongs to (for authors, their own id). Not
+    # a foreign key: entries outlive the rows they describe.
+    author_id = Column(Integer)
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    # Never reuse the seq of a deleted entry, even on SQLite.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+# Full-text indexes on the names back the /search endpoints.
+search.install(Author.__table__)
+search.install(Book.__table__)
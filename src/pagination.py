@@ -0,0 +1,33 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+
+def encode_cursor(position: dict) -> str:
+    payload = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *keys: str) -> dict:
+    # Every cursor carries the last id; orderings on other columns name the
+    # extra numeric keys they need in *keys.
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(position, dict) or not isinstance(position.get("id"), int):
+            raise ValueError
+        for key in keys:
+            value = position.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError
+        return position
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "status": "error",
+                "data": None,
+                "detail": "Invalid cursor",
+            },
+        )
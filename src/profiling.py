@@ -0,0 +1,122 @@
+import heapq
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    __slots__ = ("query_count", "db_time", "slowest", "keep")
+
+    def __init__(self, keep: int = 3):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.slowest: List[Tuple[float, str]] = []
+        self.keep = keep
+
+    def record(self, statement: str, duration: float) -> None:
+        self.query_count += 1
+        self.db_time += duration
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, (duration, statement))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, statement))
+
+    def slowest_statements(self) -> List[dict]:
+        return [
+            {"ms": round(duration * 1000, 3), "statement": statement}
+            for duration, statement in sorted(self.slowest, reverse=True)
+        ]
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+# The start time is kept on the execution context, which lives only as long
+# as the statement: after_cursor_execute is not called for statements that
+# fail, and anything kept on the connection would outlive them.
+START_TIME = "_profiling_start_time"
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        setattr(context, START_TIME, time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, START_TIME, None)
+    profile = current_profile.get()
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+class QueryProfilingMiddleware:
+    # Collects the statements each HTTP request runs, reports them in a
+    # Server-Timing header and logs one JSON line per request; requests over
+    # slow_request_ms are logged as warnings with their slowest statements.
+    def __init__(self, app, slow_request_ms: float = 500, slowest_statements: int = 3):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.slowest_statements = slowest_statements
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(self.slowest_statements)
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        status_code = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={profile.db_time * 1000:.3f};desc="{profile.query_count} queries", '
+                    f"app;dur={total_ms:.3f}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            total_ms = (time.perf_counter() - started) * 1000
+            slow = total_ms >= self.slow_request_ms
+            level = logging.WARNING if slow else logging.DEBUG
+            if logger.isEnabledFor(level):
+                record = {
+                    "event": "request_profile",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round(total_ms, 3),
+                    "query_count": profile.query_count,
+                    "db_ms": round(profile.db_time * 1000, 3),
+                    "slow": slow,
+                }
+                if slow:
+                    record["slowest"] = profile.slowest_statements()
+                logger.log(level, json.dumps(record))
@@ -0,0 +1,51 @@
+import time
+from operator import attrgetter
+from typing import Iterable, Optional, Sequence, Type
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, ORJSONResponse, UJSONResponse
+
+from metrics import serialization_duration
+
+
+def response_class(name: str) -> Type[JSONResponse]:
+    try:
+        if name == "orjson":
+            import orjson  # noqa: F401
+
+            return ORJSONResponse
+        if name == "ujson":
+            import ujson  # noqa: F401
+
+            return UJSONResponse
+    except ImportError:
+        pass
+    return JSONResponse
+
+
+def timed(base: Type[JSONResponse]) -> Type[JSONResponse]:
+    class TimedResponse(base):
+        def render(self, content) -> bytes:
+            started = time.perf_counter()
+            try:
+                return super().render(content)
+            finally:
+                serialization_duration.observe(time.perf_counter() - started)
+
+    TimedResponse.__name__ = base.__name__
+    return TimedResponse
+
+
+def json_response(request: Request, body: dict, etag: Optional[str] = None) -> JSONResponse:
+    # Returning a Response skips FastAPI's response_model validation and
+    # jsonable_encoder pass; the body is already made of plain JSON types.
+    # Encoded like every other response of the app (see main.create_app).
+    response_class = request.app.state.response_class
+    return response_class(body, headers={"ETag": etag} if etag else None)
+
+
+def rows_to_dicts(rows: Iterable, fields: Sequence[str]) -> list:
+    # Builds the response items straight from the result rows instead of
+    # going through a Pydantic model per row. Needs at least two fields.
+    getter = attrgetter(*fields)
+    return [dict(zip(fields, getter(row))) for row in rows]
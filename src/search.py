@@ -0,0 +1,108 @@
+import re
+from typing import Optional
+
+from sqlalchemy import DDL, Table, event, func, literal_column, or_, select, table
+
+# SQLite gets an external-content FTS5 table per searchable table, kept in
+# sync by triggers. Postgres gets a pg_trgm GIN index on the column, which
+# it maintains by itself. Either way a search is an index lookup rather
+# than a scan of the whole table.
+
+TOKEN = re.compile(r"\w+")
+
+
+def fts_table(name: str) -> str:
+    return f"{name}_fts"
+
+
+def sqlite_ddl(name: str, column: str = "name") -> list:
+    fts = fts_table(name)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5("
+        f"{column}, content='{name}', content_rowid='id', prefix='2 3')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {name} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {column} ON {name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def postgresql_ddl(name: str, column: str = "name") -> list:
+    return [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS ix_{name}_{column}_trgm "
+        f"ON {name} USING gin ({column} gin_trgm_ops)",
+    ]
+
+
+def install(target: Table, column: str = "name") -> None:
+    # Used by metadata.create_all(); migrations issue the same statements.
+    for statement in sqlite_ddl(target.name, column):
+        event.listen(target, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    for statement in postgresql_ddl(target.name, column):
+        event.listen(
+            target, "after_create", DDL(statement).execute_if(dialect="postgresql")
+        )
+    event.listen(
+        target,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {fts_table(target.name)}").execute_if(
+            dialect="sqlite"
+        ),
+    )
+
+
+def match_query(q: str) -> Optional[str]:
+    # Every word must match, the last one as a prefix, so results narrow as
+    # the user types. Quoting keeps FTS5 operators in q from being parsed.
+    tokens = TOKEN.findall(q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"' for token in tokens[:-1]) + f' "{tokens[-1]}"*'
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_select(
+    model, columns, q: str, dialect: str, position: Optional[dict] = None
+):
+    # Rows carry a rank where lower is better, and pages continue after the
+    # {"rank", "id"} position of the last row seen. None means q has no words.
+    if dialect == "sqlite":
+        query = match_query(q)
+        if query is None:
+            return None
+        fts = table(fts_table(model.__tablename__))
+        fts_name = literal_column(fts.name)
+        rank = func.bm25(fts_name)
+        stmt = (
+            select(*columns, rank.label("rank"))
+            .join_from(model, fts, literal_column(f"{fts.name}.rowid") == model.id)
+            .where(fts_name.op("MATCH")(query))
+        )
+    else:
+        if not q.strip():
+            return None
+        rank = -func.similarity(model.name, q)
+        stmt = select(*columns, rank.label("rank")).where(
+            or_(
+                model.name.op("%")(q),
+                model.name.ilike(f"%{escape_like(q)}%", escape="\\"),
+            )
+        )
+
+    if position is not None:
+        stmt = stmt.where(
+            or_(
+                rank > position["rank"],
+                (rank == position["rank"]) & (model.id > position["id"]),
+            )
+        )
+    return stmt.order_by(rank, model.id)
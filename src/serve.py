@@ -0,0 +1,84 @@
+"""Production server: one uvicorn worker process per core.
+
+    python -m src.serve --workers 4 --port 8000
+
+Workers import the app with main.create_app, so every worker opens its own
+database pools in the lifespan, after the process has started, and never
+shares a connection inherited from the parent. WEB_CONCURRENCY is exported
+to the workers, so with DB_CONNECTION_BUDGET set each one sizes its pools to
+its share of the budget. With more than one worker the per-process
+memory:// cache is turned off (CACHE_URL=none), since a write would only
+invalidate the worker that served it; use a shared backend (redis://) to
+cache. uvloop and httptools are used when installed.
+"""
+
+import argparse
+import os
+import sys
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import uvicorn  # noqa: E402
+
+from config import Settings, settings  # noqa: E402
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.web_concurrency or os.cpu_count() or 1,
+        help="default: WEB_CONCURRENCY, else the number of cores",
+    )
+    parser.add_argument("--loop", choices=("auto", "asyncio", "uvloop"), default="auto")
+    parser.add_argument("--http", choices=("auto", "h11", "httptools"), default="auto")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--no-access-log", dest="access_log", action="store_false", default=True
+    )
+    return parser.parse_args(argv)
+
+
+def worker_environment(workers: int, settings: Settings) -> dict:
+    # Read by Settings in every worker.
+    environment = {"WEB_CONCURRENCY": str(workers)}
+    if workers > 1 and settings.cache_url.startswith("memory://"):
+        # Every worker would keep its own LRU and the others would go on
+        # serving old bodies, and 304s for their ETags, for up to CACHE_TTL
+        # after a write.
+        environment["CACHE_URL"] = "none"
+    return environment
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    environment = worker_environment(args.workers, settings)
+    if "CACHE_URL" in environment:
+        print(
+            "CACHE_URL=memory:// is not shared between workers, caching is off; "
+            "set CACHE_URL=redis://... to cache",
+            file=sys.stderr,
+        )
+    os.environ.update(environment)
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=args.loop,
+        http=args.http,
+        backlog=args.backlog,
+        log_level=args.log_level,
+        access_log=args.access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
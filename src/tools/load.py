@@ -0,0 +1,311 @@
+"""Bulk import of authors and books from flat files.
+
+    python -m src.tools.load --authors authors.csv --books books.ndjson
+
+Author rows need a "name"; book rows a "name" and either "author" (an
+author name) or "author_id". Files are CSV with a header row or NDJSON,
+chosen by extension unless --format is given. Rows are read in chunks of
+--batch-size and written by --workers concurrent batch inserts; rows that
+already exist (by name) are skipped. Prints rows/sec per file and a JSON
+summary.
+
+SQLite allows one writer at a time, so there --workers is 1 and only the
+parsing overlaps with the writes. On PostgreSQL the batch inserts run in
+parallel; their commits still take the change feed lock one at a time
+(see changelog.before_commit).
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from pydantic import ValidationError  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+
+from authors.router import LIST_NAMESPACES  # noqa: E402
+from authors.schemas import AuthorCreate  # noqa: E402
+from books.router import change_book_counts, list_namespaces, stats_names  # noqa: E402
+from books.schemas import BookCreate  # noqa: E402
+from bulk import BATCH_SIZE, dialect_insert  # noqa: E402
+from cache import create_cache  # noqa: E402
+from changelog import change, record_changes  # noqa: E402
+from config import settings  # noqa: E402
+from database import create_engines  # noqa: E402
+from models import Author, Book  # noqa: E402
+
+FORMATS = ("csv", "ndjson")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--authors", help="file of authors to load first")
+    parser.add_argument("--books", help="file of books to load")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--database-url", default=settings.database_url)
+    args = parser.parse_args(argv)
+    if not args.authors and not args.books:
+        parser.error("nothing to load, pass --authors and/or --books")
+    return args
+
+
+def file_format(path: str, format: Optional[str]) -> str:
+    if format is not None:
+        return format
+    extension = os.path.splitext(path)[1].lower()
+    return "csv" if extension in (".csv", ".tsv") else "ndjson"
+
+
+def read_rows(path: str, format: str) -> Iterator[dict]:
+    with open(path, newline="", encoding="utf-8") as file:
+        if format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Stats:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.read = 0
+        self.created = 0
+        self.existing = 0
+        self.rejected = 0
+        self.author_ids = set()
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def report(self) -> dict:
+        return {
+            "read": self.read,
+            "created": self.created,
+            "existing": self.existing,
+            "rejected": self.rejected,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.read / self.elapsed) if self.elapsed else 0,
+        }
+
+
+async def run_pipeline(
+    engine: AsyncEngine,
+    batches: Iterator[List[dict]],
+    write: Callable,
+    workers: int,
+) -> None:
+    # The file is parsed while up to `workers` batches are being written, each
+    # in a transaction of its own. A bounded queue keeps the reader from
+    # running ahead of the writers, so memory stays at a few batches.
+    queue: asyncio.Queue = asyncio.Queue(workers * 2)
+
+    async def writer():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            async with AsyncSession(engine) as session:
+                await write(session, batch)
+                await session.commit()
+
+    async def put(item) -> None:
+        # A writer whose batch failed stops taking batches, so waiting for
+        # room in the queue alone could wait forever. Its error is raised
+        # here instead.
+        put = asyncio.ensure_future(queue.put(item))
+        try:
+            while not put.done():
+                running = [task for task in tasks if not task.done()]
+                await asyncio.wait([put, *running], return_when=asyncio.FIRST_COMPLETED)
+                for task in tasks:
+                    if task.done() and task.exception() is not None:
+                        raise task.exception()
+        finally:
+            put.cancel()
+
+    tasks = [asyncio.ensure_future(writer()) for _ in range(workers)]
+    try:
+        for batch in batches:
+            await put(batch)
+            # Lets writers start while the next chunk is parsed.
+            await asyncio.sleep(0)
+        for _ in tasks:
+            await put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def load_authors(
+    engine: AsyncEngine, rows: Iterable[dict], batch_size: int, workers: int
+) -> Stats:
+    stats = Stats("authors")
+
+    def prepare(chunk: List[dict]) -> List[dict]:
+        values = {}
+        for row in chunk:
+            stats.read += 1
+            try:
+                author = AuthorCreate.model_validate(row)
+            except ValidationError:
+                stats.rejected += 1
+                continue
+            if author.name in values:
+                stats.existing += 1
+                continue
+            values[author.name] = {"name": author.name}
+        return list(values.values())
+
+    async def write(session: AsyncSession, values: List[dict]) -> None:
+        stmt = (
+            dialect_insert(session)(Author)
+            .on_conflict_do_nothing()
+            .returning(Author.id)
+        )
+        created = (await session.execute(stmt, values)).scalars().all()
+        await record_changes(session, *(change("author", "create", id, id) for id in created))
+        stats.created += len(created)
+        stats.existing += len(values) - len(created)
+
+    batches = (prepare(chunk) for chunk in chunks(rows, batch_size))
+    await run_pipeline(engine, (batch for batch in batches if batch), write, workers)
+    stats.elapsed = time.perf_counter() - stats.started
+    return stats
+
+
+async def author_map(engine: AsyncEngine) -> Dict[str, int]:
+    # Every author name and id in one streamed pass, so book rows resolve
+    # their author without a query each.
+    names = {}
+    async with AsyncSession(engine) as session:
+        stmt = select(Author.id, Author.name).execution_options(yield_per=BATCH_SIZE * 10)
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            names.update((row.name, row.id) for row in rows)
+    return names
+
+
+async def load_books(
+    engine: AsyncEngine, rows: Iterable[dict], batch_size: int, workers: int
+) -> Stats:
+    stats = Stats("books")
+    authors = await author_map(engine)
+    known_ids = set(authors.values())
+
+    def prepare(chunk: List[dict]) -> List[dict]:
+        values = {}
+        for row in chunk:
+            stats.read += 1
+            row = dict(row)
+            # CSV files with both columns have an empty "author" where the
+            # row gives an author_id.
+            author = row.pop("author", None)
+            if author:
+                row["author_id"] = authors.get(author)
+            try:
+                book = BookCreate.model_validate(row)
+            except ValidationError:
+                stats.rejected += 1
+                continue
+            if book.author_id not in known_ids:
+                stats.rejected += 1
+                continue
+            if book.name in values:
+                stats.existing += 1
+                continue
+            values[book.name] = book.model_dump()
+        return list(values.values())
+
+    async def write(session: AsyncSession, values: List[dict]) -> None:
+        stmt = (
+            dialect_insert(session)(Book)
+            .on_conflict_do_nothing()
+            .returning(Book.id, Book.author_id)
+        )
+        created = (await session.execute(stmt, values)).all()
+        await record_changes(
+            session, *(change("book", "create", row.id, row.author_id) for row in created)
+        )
+        # In the batch's own transaction, so an interrupted load leaves
+        # book_count matching the books it did write.
+        await change_book_counts(session, Counter(row.author_id for row in created))
+        stats.created += len(created)
+        stats.existing += len(values) - len(created)
+        stats.author_ids.update(row.author_id for row in created)
+
+    batches = (prepare(chunk) for chunk in chunks(rows, batch_size))
+    await run_pipeline(engine, (batch for batch in batches if batch), write, workers)
+    stats.elapsed = time.perf_counter() - stats.started
+    return stats
+
+
+async def main(argv=None) -> dict:
+    args = parse_args(argv)
+    workers = args.workers
+    if make_url(args.database_url).get_backend_name() == "sqlite":
+        # More writers would only queue for the database's write lock.
+        workers = 1
+    # One pooled connection per worker, so none of them waits for a checkout.
+    pool = settings.model_copy(update={"db_pool_size": max(workers, settings.db_pool_size)})
+    writer, reader = create_engines(args.database_url, pool)
+    # Shared caches (Redis) would otherwise serve the old pages until they
+    # expire.
+    cache = create_cache(settings)
+    report = {}
+    try:
+        for kind, path, load in (
+            ("authors", args.authors, load_authors),
+            ("books", args.books, load_books),
+        ):
+            if not path:
+                continue
+            rows = read_rows(path, file_format(path, args.format))
+            stats = await load(writer, rows, args.batch_size, workers)
+            report[kind] = stats.report()
+            print(
+                f"{kind}: {stats.read} rows in {stats.elapsed:.1f}s "
+                f"({report[kind]['rows_per_second']} rows/s)",
+                file=sys.stderr,
+            )
+            if kind == "authors":
+                await cache.bump(*LIST_NAMESPACES)
+            else:
+                await cache.bump(
+                    *LIST_NAMESPACES,
+                    *list_namespaces(*stats.author_ids),
+                    *stats_names(*stats.author_ids),
+                )
+    finally:
+        await cache.close()
+        await writer.dispose()
+        if reader is not writer:
+            await reader.dispose()
+    return report
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(main()), indent=2))
@@ -8,15 +8,17 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
-from database import get_async_session
+from config import Settings
+from database import enable_foreign_keys, get_async_session, get_read_session
 
 from src.config import DATABASE_URL_TEST
-from src.main import app
+from src.main import create_app
 from src.models import metadata
 
 # DATABASE
 
 engine_test = create_async_engine(DATABASE_URL_TEST, poolclass=NullPool)
+enable_foreign_keys(engine_test)
 async_session_maker = sessionmaker(
     engine_test, class_=AsyncSession, expire_on_commit=False
 )
@@ -28,7 +30,16 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-app.dependency_overrides[get_async_session] = override_get_async_session
+def make_app(**settings):
+    # The app under test, built from test settings so that starting it never
+    # touches the DATABASE_URL database; sessions come from engine_test.
+    test_app = create_app(Settings(database_url=DATABASE_URL_TEST, **settings))
+    test_app.dependency_overrides[get_async_session] = override_get_async_session
+    test_app.dependency_overrides[get_read_session] = override_get_async_session
+    return test_app
+
+
+app = make_app()
 
 
 @pytest.fixture(autouse=True, scope="session")
@@ -52,5 +63,7 @@ client = TestClient(app)
 
 @pytest.fixture(scope="session")
 async def ac() -> AsyncGenerator[AsyncClient, None]:
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        yield ac
+    # httpx does not run the app's lifespan, so enter it here as a server would
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            yield ac
@@ -157,3 +157,267 @@ async def test_delete_author(ac: AsyncClient):
     assert error_data["detail"]["status"] == "error" 
     assert error_data["detail"]["data"] is None
     assert error_data["detail"]["detail"] == "Author not found"
+
+
+@pytest.mark.asyncio
+async def test_get_authors_cursor(ac: AsyncClient):
+    response = await ac.get("/authors?limit=2")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["data"]) == 2
+    assert data["next_cursor"] is not None
+
+    # Walk the remaining pages and make sure every author is seen exactly once
+    seen = [author["id"] for author in data["data"]]
+    cursor = data["next_cursor"]
+    while cursor is not None:
+        response = await ac.get(f"/authors?limit=2&cursor={cursor}")
+        assert response.status_code == 200
+        data = response.json()
+        seen.extend(author["id"] for author in data["data"])
+        cursor = data["next_cursor"]
+
+    response = await ac.get("/authors?limit=1000")
+    assert seen == [author["id"] for author in response.json()["data"]]
+
+    # Try to use a cursor that was not issued by the API
+    response = await ac.get("/authors?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+    error_data = response.json()
+    assert error_data["detail"]["status"] == "error"
+    assert error_data["detail"]["detail"] == "Invalid cursor"
+
+
+@pytest.mark.asyncio
+async def test_update_author_partial(ac: AsyncClient):
+    response = await ac.get("/authors/1")
+    name = response.json()["data"]["name"]
+
+    # Fields left out of a PATCH body are not changed
+    response = await ac.patch("/authors/1", json={})
+    assert response.status_code == 200
+    assert response.json()["data"]["name"] == name
+
+
+class Catalogue:
+    # Creates authors and books through the API and deletes them again after
+    # the test, so these tests neither depend on nor change the rows that
+    # the other tests count.
+    def __init__(self, ac: AsyncClient):
+        self.ac = ac
+        self.authors = []
+        self.books = []
+
+    async def author(self, name: str) -> int:
+        response = await self.ac.post("/authors", json={"name": name})
+        assert response.status_code == 200
+        self.authors.append(response.json()["data"]["id"])
+        return self.authors[-1]
+
+    async def book(self, name: str, author_id: int) -> int:
+        response = await self.ac.post("/books", json={"name": name, "author_id": author_id})
+        assert response.status_code == 200
+        self.books.append(response.json()["data"]["id"])
+        return self.books[-1]
+
+    async def remove(self):
+        # Books first, the authors are still referenced until then
+        for book_id in self.books:
+            await self.ac.delete(f"/books/{book_id}")
+        for author_id in self.authors:
+            await self.ac.delete(f"/authors/{author_id}")
+
+
+@pytest.fixture
+async def catalogue(ac: AsyncClient):
+    catalogue = Catalogue(ac)
+    yield catalogue
+    await catalogue.remove()
+
+
+@pytest.mark.asyncio
+async def test_get_author_include_books(ac: AsyncClient, catalogue: Catalogue):
+    author_id = await catalogue.author("Include Author")
+    book_id = await catalogue.book("Include Book", author_id)
+
+    response = await ac.get(f"/authors/{author_id}?include=books")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["data"]["id"] == author_id
+    assert [book["id"] for book in data["data"]["books"]] == [book_id]
+    assert data["data"]["books"][0]["author_id"] == author_id
+
+    # Without the include the books are not loaded at all
+    response = await ac.get("/authors?limit=1")
+    assert "books" not in response.json()["data"][0]
+
+    response = await ac.get("/authors?include=reviews")
+    assert response.status_code == 400
+    assert response.json()["detail"]["detail"] == "Unknown include: reviews"
+
+
+@pytest.mark.asyncio
+async def test_create_authors_bulk(ac: AsyncClient, catalogue: Catalogue):
+    existing = await catalogue.author("Bulk Existing Author")
+    payload = [
+        {"name": "Bulk Author 1"},
+        {"name": "Bulk Author 2"},
+        {"name": "Bulk Existing Author"},  # already exists
+        {"name": "Bulk Author 1"},  # duplicated in the request
+        {},  # missing name
+    ]
+    response = await ac.post("/authors/bulk", json=payload)
+    assert response.status_code == 200
+
+    data = response.json()["data"]
+    catalogue.authors.extend(item["id"] for item in data["items"] if item["status"] == "created")
+    assert [item["status"] for item in data["items"]] == [
+        "created",
+        "created",
+        "existing",
+        "error",
+        "error",
+    ]
+    assert data["created"] == 2
+    assert data["existing"] == 1
+    assert data["failed"] == 2
+    assert data["items"][2]["id"] == existing
+
+    # NDJSON bodies are accepted as well
+    response = await ac.post(
+        "/authors/bulk",
+        content=b'{"name": "Bulk Author 3"}\n{"name": "Bulk Author 4"}\n',
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    data = response.json()["data"]
+    catalogue.authors.extend(item["id"] for item in data["items"] if item["status"] == "created")
+    assert data["created"] == 2
+
+    response = await ac.post("/authors/bulk", content=b"{not json")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_authors(ac: AsyncClient, catalogue: Catalogue):
+    await catalogue.author("Quoted Writer 1")
+    await catalogue.author("Bulk Quoted Writer 1")
+
+    # Quotes and other FTS syntax in q are treated as plain text
+    response = await ac.get('/authors/search?q="quoted writer 1')
+    assert response.status_code == 200
+    names = [author["name"] for author in response.json()["data"]]
+    assert names == ["Quoted Writer 1", "Bulk Quoted Writer 1"]
+
+    response = await ac.get("/authors/search?q=author&cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_batch_get_authors(ac: AsyncClient, catalogue: Catalogue):
+    first = await catalogue.author("Batch Author 1")
+    second = await catalogue.author("Batch Author 2")
+
+    response = await ac.post("/authors/batch-get", json={"ids": [second, 999, first]})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [author["name"] for author in data["items"]] == ["Batch Author 2", "Batch Author 1"]
+    assert data["missing"] == [999]
+
+    response = await ac.post("/authors/batch-get", json={"ids": list(range(1002))})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_author_book_count(ac: AsyncClient, catalogue: Catalogue):
+    async def book_count(author_id):
+        response = await ac.get(f"/authors/{author_id}/stats")
+        assert response.status_code == 200
+        return response.json()["data"]["book_count"]
+
+    a = await catalogue.author("Counted Author A")
+    b = await catalogue.author("Counted Author B")
+
+    book_id = await catalogue.book("Counted Book", a)
+    assert await book_count(a) == 1
+
+    await ac.patch(f"/books/{book_id}", json={"author_id": b})
+    assert await book_count(a) == 0
+    assert await book_count(b) == 1
+
+    response = await ac.post(
+        "/books/bulk?on_conflict=update",
+        json=[
+            {"name": "Counted Book", "author_id": a},
+            {"name": "Counted Book 2", "author_id": a},
+        ],
+    )
+    catalogue.books.append(response.json()["data"]["items"][1]["id"])
+    assert await book_count(a) == 2
+    assert await book_count(b) == 0
+
+    # Authors ranked by book_count, most books first, walked with the cursor
+    response = await ac.get("/authors?order_by=book_count&limit=1000")
+    ranked = [(author["book_count"], author["id"]) for author in response.json()["data"]]
+    assert ranked == sorted(ranked, reverse=True)
+    assert (2, a) in ranked
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/authors?order_by=book_count&limit=2"
+        response = await ac.get(url if cursor is None else f"{url}&cursor={cursor}")
+        data = response.json()
+        seen.extend((author["book_count"], author["id"]) for author in data["data"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ranked
+
+    await ac.delete(f"/books/{book_id}")
+    assert await book_count(a) == 1
+
+    response = await ac.get("/authors/999/stats")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_author_books(ac: AsyncClient, catalogue: Catalogue):
+    author_id = await catalogue.author("Nested Author")
+    expected = [await catalogue.book(f"Nested Book {i}", author_id) for i in range(3)]
+
+    response = await ac.get(f"/authors/{author_id}/books?limit=2")
+    assert response.status_code == 200
+    data = response.json()
+    assert [book["id"] for book in data["data"]] == expected[:2]
+    response = await ac.get(
+        f"/authors/{author_id}/books?limit=1000&cursor={data['next_cursor']}"
+    )
+    assert [book["id"] for book in response.json()["data"]] == expected[2:]
+
+    # Authors without books get an empty page, unknown authors a 404
+    empty = await catalogue.author("Author Without Books")
+    response = await ac.get(f"/authors/{empty}/books")
+    assert response.status_code == 200
+    assert response.json()["data"] == []
+    response = await ac.get("/authors/999/books")
+    assert response.status_code == 404
+
+    # expand=books cuts every author's books at books_limit
+    response = await ac.get("/authors?expand=books&books_limit=2&limit=1000")
+    assert response.status_code == 200
+    authors = {author["id"]: author for author in response.json()["data"]}
+    assert [book["id"] for book in authors[author_id]["books"]] == expected[:2]
+    assert authors[author_id]["books_next_cursor"] == data["next_cursor"]
+    assert all(len(author["books"]) <= 2 for author in authors.values())
+    assert all(
+        book["author_id"] == author["id"]
+        for author in authors.values()
+        for book in author["books"]
+    )
+
+    response = await ac.get("/authors?expand=reviews")
+    assert response.status_code == 400
+    assert response.json()["detail"]["detail"] == "Unknown expand: reviews"
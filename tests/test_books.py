@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from httpx import AsyncClient
 from sqlalchemy import select
@@ -189,4 +191,151 @@ async def test_delete_book(ac: AsyncClient):
     error_data = verify_deleted_response.json()
     assert error_data["detail"]["status"] == "error" 
     assert error_data["detail"]["data"] is None
-    assert error_data["detail"]["detail"] == "Book not found"
\ No newline at end of file
+    assert error_data["detail"]["detail"] == "Book not found"
+
+@pytest.mark.asyncio
+async def test_get_books_cursor(ac: AsyncClient):
+    for i in range(3):
+        response = await ac.post(
+            "/books", json={"name": f"Cursor Book {i}", "author_id": 2}
+        )
+        assert response.status_code == 200
+
+    # Page through the books of a single author
+    response = await ac.get("/books?author_id=2&limit=2")
+    assert response.status_code == 200
+    data = response.json()
+    assert [book["author_id"] for book in data["data"]] == [2, 2]
+    assert data["next_cursor"] is not None
+
+    response = await ac.get(f"/books?author_id=2&limit=2&cursor={data['next_cursor']}")
+    assert response.status_code == 200
+    data = response.json()
+    assert [book["name"] for book in data["data"]] == [
+        "Cursor Book 1",
+        "Cursor Book 2",
+    ]
+    assert data["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_create_books_bulk(ac: AsyncClient):
+    payload = [
+        {"name": "Bulk Book 1", "author_id": 1},
+        {"name": "Bulk Book 2", "author_id": 999},  # unknown author
+        {"name": "Book 1", "author_id": 1},  # already exists
+    ]
+    response = await ac.post("/books/bulk", json=payload)
+    assert response.status_code == 200
+
+    data = response.json()["data"]
+    assert [item["status"] for item in data["items"]] == [
+        "created",
+        "error",
+        "existing",
+    ]
+    assert data["items"][1]["detail"] == "Author does not exist"
+
+    # Upsert moves the existing book to another author
+    response = await ac.post(
+        "/books/bulk?on_conflict=update",
+        json=[{"name": "Bulk Book 1", "author_id": 2}],
+    )
+    assert response.status_code == 200
+    item = response.json()["data"]["items"][0]
+    assert item["status"] == "updated"
+
+    response = await ac.get(f"/books/{item['id']}")
+    assert response.json()["data"]["author_id"] == 2
+
+
+@pytest.mark.asyncio
+async def test_export_books(ac: AsyncClient):
+    response = await ac.get("/books/export?author_id=1")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows[0] == {"id": 1, "name": "Book 1", "author_id": 1}
+    assert all(row["author_id"] == 1 for row in rows)
+
+    response = await ac.get("/authors/export?format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    lines = response.text.splitlines()
+    assert lines[0] == "id,name"
+    assert lines[1] == "1,Author 1"
+
+
+@pytest.mark.asyncio
+async def test_book_author_must_exist(ac: AsyncClient):
+    response = await ac.post("/books", json={"name": "Orphan Book", "author_id": 999})
+    assert response.status_code == 400
+    assert response.json()["detail"]["detail"] == "Author does not exist"
+
+    response = await ac.patch("/books/1", json={"author_id": 999})
+    assert response.status_code == 400
+    assert response.json()["detail"]["detail"] == "Author does not exist"
+
+    response = await ac.get("/books/1")
+    assert response.json()["data"]["author_id"] == 1
+
+    # Authors that still have books cannot be deleted
+    response = await ac.delete("/authors/1")
+    assert response.status_code == 400
+    assert response.json()["detail"]["detail"] == "Author still has books"
+
+
+@pytest.mark.asyncio
+async def test_search(ac: AsyncClient):
+    for name in ["Search Alpha Omega", "Search Alpha", "Search Beta"]:
+        response = await ac.post("/books", json={"name": name, "author_id": 2})
+        assert response.status_code == 200
+
+    # The closest match comes first; the last word matches as a prefix
+    response = await ac.get("/books/search?q=search alph")
+    assert response.status_code == 200
+    data = response.json()
+    assert [book["name"] for book in data["data"]] == [
+        "Search Alpha",
+        "Search Alpha Omega",
+    ]
+    assert data["next_cursor"] is None
+
+    response = await ac.get("/books/search?q=search&limit=2")
+    data = response.json()
+    assert len(data["data"]) == 2
+    response = await ac.get(f"/books/search?q=search&limit=2&cursor={data['next_cursor']}")
+    seen = [book["name"] for book in data["data"] + response.json()["data"]]
+    assert sorted(seen) == ["Search Alpha", "Search Alpha Omega", "Search Beta"]
+
+    # Renamed and deleted rows are kept in sync with the index
+    book_id = data["data"][0]["id"]
+    await ac.patch(f"/books/{book_id}", json={"name": "Renamed Gamma"})
+    response = await ac.get("/books/search?q=gamma")
+    assert [book["id"] for book in response.json()["data"]] == [book_id]
+    await ac.delete(f"/books/{book_id}")
+    response = await ac.get("/books/search?q=gamma")
+    assert response.json()["data"] == []
+
+    # Quotes and other FTS syntax in q are treated as plain text
+    response = await ac.get('/books/search?q="search beta')
+    assert [book["name"] for book in response.json()["data"]] == ["Search Beta"]
+
+    response = await ac.get("/books/search?q=search&cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_batch_get(ac: AsyncClient):
+    response = await ac.post("/books/batch-get", json={"ids": [2, 999, 1, 2]})
+    assert response.status_code == 200
+
+    data = response.json()["data"]
+    assert [book["id"] for book in data["items"]] == [2, 1]
+    assert data["items"][0] == {"id": 2, "name": "Book 2", "author_id": 2}
+    assert data["missing"] == [999]
+
+    response = await ac.post("/books/batch-get", json={"ids": list(range(1002))})
+    assert response.status_code == 422
@@ -0,0 +1,123 @@
+import pytest
+from httpx import AsyncClient
+
+from cache import MemoryCache, RedisCache, list_key, lookup, store
+from database import REPLICA
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_lru_and_ttl():
+    clock = FakeClock()
+    cache = MemoryCache(ttl=10, max_entries=2, clock=clock)
+
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1  # "a" is now the most recently used
+    await cache.set("c", 3)
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+
+    clock.now = 11
+    assert await cache.get("a") is None
+    assert await cache.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_generations_are_bounded():
+    cache = MemoryCache(ttl=10, max_entries=2)
+
+    seen = {await cache.generation("a")}
+    for name in ("a", "b", "c"):
+        await cache.bump(name)
+        seen.add(await cache.generation(name))
+    assert len(cache._generations) == 2
+
+    # "a" was dropped, and neither it nor a name never bumped may fall back
+    # to a generation an entry could have been stored under
+    assert await cache.generation("a") not in seen
+    assert await cache.generation("d") not in seen
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_generations():
+    cache = RedisCache(FakeRedis(), ttl=10)
+
+    key = await list_key(cache, "books", 0, 10, None)
+    await cache.set(key, {"data": [1, 2]})
+    assert await cache.get(key) == {"data": [1, 2]}
+
+    await cache.bump("books")
+    assert await list_key(cache, "books", 0, 10, None) != key
+
+    await cache.delete(key)
+    assert await cache.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_cache_skips_replica_reads_and_recent_writers():
+    class FakeRequest:
+        def __init__(self, cookies):
+            self.cookies = cookies
+
+    class FakeSession:
+        def __init__(self, info):
+            self.info = info
+
+    cache = MemoryCache(ttl=10, max_entries=10)
+
+    await store(cache, FakeSession({REPLICA: True}), "book:1:0", {"body": "replica"})
+    assert await cache.get("book:1:0") is None
+
+    await store(cache, FakeSession({}), "book:1:0", {"body": "primary"})
+    assert await lookup(cache, FakeRequest({}), "book:1:0") == {"body": "primary"}
+    recent = FakeRequest({"read_primary_until": "99999999999"})
+    assert await lookup(cache, recent, "book:1:0") is None
+
+
+@pytest.mark.asyncio
+async def test_book_move_invalidates_both_authors(ac: AsyncClient):
+    response = await ac.post("/books", json={"name": "Moving Book", "author_id": 1})
+    book_id = response.json()["data"]["id"]
+
+    # Warm the cache for both authors' lists and the book itself
+    response = await ac.get("/books?author_id=1&limit=1000")
+    assert book_id in [book["id"] for book in response.json()["data"]]
+    response = await ac.get("/books?author_id=2&limit=1000")
+    assert book_id not in [book["id"] for book in response.json()["data"]]
+    await ac.get(f"/books/{book_id}")
+
+    response = await ac.patch(f"/books/{book_id}", json={"author_id": 2})
+    assert response.status_code == 200
+
+    response = await ac.get("/books?author_id=1&limit=1000")
+    assert book_id not in [book["id"] for book in response.json()["data"]]
+    response = await ac.get("/books?author_id=2&limit=1000")
+    assert book_id in [book["id"] for book in response.json()["data"]]
+    response = await ac.get(f"/books/{book_id}")
+    assert response.json()["data"]["author_id"] == 2
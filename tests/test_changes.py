@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from changelog import ChangeSignal
+
+
+async def latest_seq(ac: AsyncClient) -> int:
+    response = await ac.get("/changes?since=0&limit=100000")
+    return response.json()["next_since"]
+
+
+@pytest.mark.asyncio
+async def test_changes_feed(ac: AsyncClient):
+    since = await latest_seq(ac)
+
+    response = await ac.post("/authors", json={"name": "Changed Author"})
+    author_id = response.json()["data"]["id"]
+    response = await ac.post("/books", json={"name": "Changed Book", "author_id": author_id})
+    book_id = response.json()["data"]["id"]
+    await ac.patch(f"/books/{book_id}", json={"name": "Changed Book 2"})
+    await ac.delete(f"/books/{book_id}")
+    await ac.patch(f"/authors/{author_id}", json={"name": "Changed Author 2"})
+
+    # Failed writes leave no entry
+    response = await ac.post("/books", json={"name": "Orphan", "author_id": 999})
+    assert response.status_code == 400
+
+    response = await ac.get(f"/changes?since={since}")
+    assert response.status_code == 200
+    data = response.json()
+    assert [(c["entity"], c["op"], c["entity_id"], c["author_id"]) for c in data["data"]] == [
+        ("author", "create", author_id, author_id),
+        ("book", "create", book_id, author_id),
+        ("book", "update", book_id, author_id),
+        ("book", "delete", book_id, author_id),
+        ("author", "update", author_id, author_id),
+    ]
+    seqs = [c["seq"] for c in data["data"]]
+    assert seqs == sorted(seqs) and seqs[0] > since
+    assert data["next_since"] == seqs[-1]
+
+    # Paging with limit and next_since
+    response = await ac.get(f"/changes?since={since}&limit=2")
+    assert [c["seq"] for c in response.json()["data"]] == seqs[:2]
+    response = await ac.get(f"/changes?since={response.json()['next_since']}")
+    assert [c["seq"] for c in response.json()["data"]] == seqs[2:]
+
+    response = await ac.get(f"/changes?since={seqs[-1]}")
+    assert response.json()["data"] == []
+    assert response.json()["next_since"] == seqs[-1]
+
+
+@pytest.mark.asyncio
+async def test_changes_long_poll(ac: AsyncClient):
+    since = await latest_seq(ac)
+
+    started = time.monotonic()
+    poll = asyncio.ensure_future(ac.get(f"/changes?since={since}&wait=5"))
+    await asyncio.sleep(0.1)
+    assert not poll.done()
+
+    response = await ac.post("/authors/bulk", json=[{"name": "Polled Author"}])
+    created_id = response.json()["data"]["items"][0]["id"]
+
+    response = await poll
+    assert time.monotonic() - started < 2
+    assert [(c["entity"], c["op"], c["entity_id"]) for c in response.json()["data"]] == [
+        ("author", "create", created_id)
+    ]
+
+    # Without changes the request returns empty once the wait is over
+    started = time.monotonic()
+    response = await ac.get(f"/changes?since={response.json()['next_since']}&wait=0.2")
+    assert response.json()["data"] == []
+    assert time.monotonic() - started >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_change_signal_keeps_notify_before_wait():
+    signal = ChangeSignal()
+
+    # A commit between looking for changes and waiting must still wake
+    changed = signal.listen()
+    signal.notify()
+    started = time.monotonic()
+    assert await signal.wait(changed, 1.0)
+    assert time.monotonic() - started < 0.5
+
+    assert not await signal.wait(signal.listen(), 0.05)
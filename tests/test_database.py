@@ -0,0 +1,187 @@
+import pytest
+from fastapi.testclient import TestClient
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from cache import NullCache
+from config import Settings
+from metrics import pool_checkout_wait
+from database import (
+    Database,
+    ReadRouter,
+    create_engines,
+    create_replica_engine,
+    engine_options,
+    wrote_recently,
+)
+from src.main import create_app
+
+
+def test_engine_options():
+    settings = Settings(db_pool_size=20, db_statement_cache_size=64)
+
+    options = engine_options("sqlite+aiosqlite:///app.db", settings)
+    assert options["pool_size"] == 20
+    assert options["connect_args"]["cached_statements"] == 64
+
+    # In-memory SQLite cannot be sized
+    options = engine_options("sqlite+aiosqlite://", settings)
+    assert "pool_size" not in options
+
+    options = engine_options("postgresql+asyncpg://localhost/app", settings)
+    assert options["connect_args"]["statement_cache_size"] == 64
+
+
+def test_engine_options_connection_budget():
+    url = "postgresql+asyncpg://localhost/app"
+
+    # 4 workers share 20 connections
+    settings = Settings(db_connection_budget=20, web_concurrency=4, db_pool_size=10)
+    options = engine_options(url, settings)
+    assert (options["pool_size"], options["max_overflow"]) == (5, 0)
+
+    # A larger share keeps pool_size and DB_MAX_OVERFLOW
+    settings = Settings(
+        db_connection_budget=40, web_concurrency=2, db_pool_size=5, db_max_overflow=10
+    )
+    options = engine_options(url, settings)
+    assert (options["pool_size"], options["max_overflow"]) == (5, 10)
+
+    # Overflow only gets what is left of the share
+    settings = Settings(
+        db_connection_budget=12, web_concurrency=2, db_pool_size=5, db_max_overflow=10
+    )
+    options = engine_options(url, settings)
+    assert (options["pool_size"], options["max_overflow"]) == (5, 1)
+
+    # Explicit sizes, e.g. the SQLite writer, are left alone
+    options = engine_options(url, settings, pool_size=1, max_overflow=0)
+    assert (options["pool_size"], options["max_overflow"]) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_production_mode(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'app.db'}"
+    writer, reader = create_engines(url, Settings(sqlite_busy_timeout_ms=1234))
+    try:
+        assert writer.pool.size() == 1
+
+        async with writer.begin() as conn:
+            assert await conn.scalar(text("PRAGMA journal_mode")) == "wal"
+            assert await conn.scalar(text("PRAGMA busy_timeout")) == 1234
+            await conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+            await conn.execute(text("INSERT INTO item VALUES (1)"))
+
+        async with reader.connect() as conn:
+            assert await conn.scalar(text("SELECT count(*) FROM item")) == 1
+            with pytest.raises(OperationalError):
+                await conn.execute(text("INSERT INTO item VALUES (2)"))
+
+        # Both pools report how long checkouts waited
+        pools = {dict(labels)["pool"] for labels in pool_checkout_wait.series}
+        assert {"primary", "reader"} <= pools
+    finally:
+        await writer.dispose()
+        await reader.dispose()
+
+
+@pytest.mark.asyncio
+async def test_read_router(tmp_path):
+    settings = Settings()
+    replicas = []
+    for name in ("replica1", "replica2"):
+        replica_url = f"sqlite+aiosqlite:///{tmp_path / name}.db"
+        writer, reader = create_engines(replica_url, settings)
+        async with writer.begin() as conn:
+            await conn.execute(text("CREATE TABLE origin (name TEXT)"))
+            await conn.execute(text(f"INSERT INTO origin VALUES ('{name}')"))
+        await writer.dispose()
+        await reader.dispose()
+        replicas.append(create_replica_engine(replica_url, settings))
+
+    async def origin(router):
+        async with router.session() as session:
+            return await session.scalar(text("SELECT name FROM origin"))
+
+    try:
+        router = ReadRouter(replicas)
+        assert [await origin(router) for _ in range(3)] == [
+            "replica1",
+            "replica2",
+            "replica1",
+        ]
+
+        # While replica1 is busy, least-connections picks replica2
+        router = ReadRouter(replicas, "least_connections")
+        async with router.session():
+            assert await origin(router) == "replica2"
+        assert router.active == [0, 0]
+    finally:
+        for replica in replicas:
+            await replica.dispose()
+
+
+def test_wrote_recently():
+    class FakeRequest:
+        def __init__(self, cookies):
+            self.cookies = cookies
+
+    assert not wrote_recently(FakeRequest({}))
+    assert wrote_recently(FakeRequest({"read_primary_until": "99999999999"}))
+    assert not wrote_recently(FakeRequest({"read_primary_until": "1"}))
+    assert not wrote_recently(FakeRequest({"read_primary_until": "garbage"}))
+
+
+@pytest.mark.asyncio
+async def test_get_pool_status(ac: AsyncClient):
+    response = await ac.get("/health/pool")
+    assert response.status_code == 200
+
+    data = response.json()["data"]["primary"]
+    assert data["pool"] == "InstrumentedQueuePool"
+    assert data["checked_out"] == 0
+    assert data["overflow"] <= 0
+
+
+def test_create_app_lifespan(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'app.db'}"
+    app = create_app(
+        Settings(
+            database_url=url, sqlite_read_pool_size=2, cache_url="none", json_response="json"
+        )
+    )
+    # Nothing is connected until the app starts
+    assert not hasattr(app.state, "database")
+
+    with TestClient(app) as client:
+        database = app.state.database
+        # Everything follows the settings passed in, not the global ones
+        assert isinstance(app.state.cache, NullCache)
+        assert app.state.response_class.__name__ == "JSONResponse"
+        response = client.get("/health/pool")
+        data = response.json()["data"]
+        # The pools were warmed on startup
+        assert (data["primary"]["checked_in"], data["readers"]["checked_in"]) == (1, 2)
+
+    assert database.read_engine.pool.checkedin() == 0
+
+
+
+def test_create_app_disposes_database_when_startup_fails(tmp_path, monkeypatch):
+    disposed = []
+    dispose = Database.dispose
+
+    async def record_dispose(self):
+        disposed.append(self)
+        await dispose(self)
+
+    monkeypatch.setattr(Database, "dispose", record_dispose)
+    # The directory does not exist, so warming the pools cannot connect
+    url = f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'app.db'}"
+    app = create_app(Settings(database_url=url, cache_url="none"))
+
+    with pytest.raises(OperationalError):
+        with TestClient(app):
+            pass
+    assert len(disposed) == 1
@@ -0,0 +1,46 @@
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_get_book_conditional(ac: AsyncClient):
+    response = await ac.post("/books", json={"name": "ETag Book", "author_id": 1})
+    book_id = response.json()["data"]["id"]
+
+    response = await ac.get(f"/books/{book_id}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await ac.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    # Any update produces a new version and therefore a new ETag
+    response = await ac.patch(f"/books/{book_id}", json={"name": "ETag Book 2"})
+    assert response.status_code == 200
+
+    response = await ac.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["data"]["name"] == "ETag Book 2"
+
+
+@pytest.mark.asyncio
+async def test_get_books_page_conditional(ac: AsyncClient):
+    response = await ac.get("/books?author_id=1")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await ac.get("/books?author_id=1", headers={"If-None-Match": f'W/{etag}'})
+    assert response.status_code == 304
+
+    # A new book of the same author changes the page
+    await ac.post("/books", json={"name": "ETag Book 3", "author_id": 1})
+    response = await ac.get("/books?author_id=1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    response = await ac.get("/authors/1")
+    etag = response.headers["etag"]
+    response = await ac.get("/authors/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
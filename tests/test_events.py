@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from broadcast import EventHub, Subscriber
+from conftest import engine_test, make_app
+from events.router import sse_events
+from src.models import Change
+
+
+def make_change(seq, entity="book", author_id=1):
+    return {
+        "seq": seq,
+        "entity": entity,
+        "op": "update",
+        "entity_id": seq,
+        "author_id": author_id,
+        "changed_at": None,
+    }
+
+
+def drain(subscriber):
+    items = []
+    while not subscriber.queue.empty():
+        items.append(subscriber.queue.get_nowait())
+    return items
+
+
+@pytest.mark.asyncio
+async def test_hub_filters_and_drops_slow_subscribers():
+    events = EventHub(poll_seconds=0)
+    everything = events.subscribe(Subscriber(queue_size=10))
+    authors = events.subscribe(Subscriber(entity="author", queue_size=10))
+    author_2 = events.subscribe(Subscriber(author_id=2, queue_size=10))
+    slow = events.subscribe(Subscriber(queue_size=2))
+
+    events.publish([make_change(1), make_change(2, "author", 2), make_change(3)])
+    events.publish([make_change(3)])  # already published, e.g. seen by the tailer
+
+    assert [change["seq"] for change in drain(everything)] == [1, 2, 3]
+    assert [change["seq"] for change in drain(authors)] == [2]
+    assert [change["seq"] for change in drain(author_2)] == [2]
+
+    # The third change did not fit, so the subscriber was dropped and woken
+    assert slow.dropped
+    assert drain(slow) == [None]
+    assert events.subscriber_count == 3
+    events.publish([make_change(4)])
+    assert drain(slow) == []
+
+
+@pytest.mark.asyncio
+async def test_sse_events():
+    hub = EventHub(poll_seconds=0)
+    subscriber = hub.subscribe(Subscriber(entity="book"))
+
+    async def connected():
+        return False
+
+    stream = sse_events(hub, subscriber, connected, keepalive=0.05)
+    assert await stream.__anext__() == ": connected\n\n"
+    assert await stream.__anext__() == ": keepalive\n\n"
+
+    hub.publish([make_change(-1)])
+    event = await stream.__anext__()
+    assert event.startswith("id: -1\nevent: change\ndata: ")
+    assert json.loads(event.split("data: ", 1)[1]) == make_change(-1)
+
+    await stream.aclose()
+    assert subscriber not in hub._subscribers.get(None, set())
+
+
+@pytest.mark.asyncio
+async def test_hub_tails_changes_from_other_processes():
+    events = EventHub(poll_seconds=0.05)
+    subscriber = events.subscribe(Subscriber(), bind=engine_test)
+    await asyncio.sleep(0.01)
+
+    # Written straight to the table, as another worker would
+    async with engine_test.begin() as conn:
+        result = await conn.execute(
+            insert(Change).returning(Change.seq),
+            {"entity": "book", "op": "create", "entity_id": 1, "author_id": 1},
+        )
+        seq = result.scalar_one()
+
+    change = await asyncio.wait_for(subscriber.get(), 1)
+    assert (change["seq"], change["entity"], change["op"]) == (seq, "book", "create")
+
+    events.unsubscribe(subscriber)
+    await asyncio.sleep(0.1)
+    assert events._tail_task is None
+
+
+def test_websocket_events():
+    # Its own app, so the lifespan runs in the client's event loop
+    app = make_app(event_poll_seconds=0)
+    with TestClient(app) as client:
+        with client.websocket_connect("/events/ws?entity=book&author_id=2") as websocket:
+            client.post("/authors", json={"name": "Ignored Author"})
+            response = client.post("/books", json={"name": "Pushed Book", "author_id": 2})
+            book_id = response.json()["data"]["id"]
+
+            change = websocket.receive_json()
+            assert (change["entity"], change["op"], change["entity_id"]) == (
+                "book",
+                "create",
+                book_id,
+            )
+            assert change["author_id"] == 2
+    assert app.state.hub.subscriber_count == 0
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from conftest import engine_test
+from src.config import DATABASE_URL_TEST
+from tools.load import main, run_pipeline
+
+
+async def author_id(ac: AsyncClient, name: str) -> int:
+    response = await ac.get("/authors/search", params={"q": name})
+    return next(item["id"] for item in response.json()["data"] if item["name"] == name)
+
+
+@pytest.mark.asyncio
+async def test_load_authors_and_books(ac: AsyncClient, tmp_path):
+    authors = tmp_path / "authors.csv"
+    authors.write_text("name\nLoaded Author A\nLoaded Author B\nLoaded Author A\n")
+    books = tmp_path / "books.ndjson"
+    lines = [
+        {"name": "Loaded Book 1", "author": "Loaded Author A"},
+        {"name": "Loaded Book 2", "author": "Loaded Author A"},
+        {"name": "Loaded Book 3", "author": "Loaded Author B"},
+        {"name": "Loaded Book 4", "author": "Unknown Author"},
+        {"name": "Loaded Book 5", "author_id": 999999},
+        {"author": "Loaded Author B"},
+    ]
+    books.write_text("\n".join(json.dumps(line) for line in lines) + "\n")
+    argv = [
+        "--authors", str(authors),
+        "--books", str(books),
+        "--batch-size", "2",
+        "--workers", "3",
+        "--database-url", DATABASE_URL_TEST,
+    ]
+
+    report = await main(argv)
+    assert {key: report["authors"][key] for key in ("read", "created", "existing", "rejected")} == {
+        "read": 3, "created": 2, "existing": 1, "rejected": 0
+    }
+    assert {key: report["books"][key] for key in ("read", "created", "existing", "rejected")} == {
+        "read": 6, "created": 3, "existing": 0, "rejected": 3
+    }
+
+    a = await author_id(ac, "Loaded Author A")
+    response = await ac.get(f"/authors/{a}/stats")
+    assert response.json()["data"]["book_count"] == 2
+    response = await ac.get(f"/authors/{a}/books")
+    assert [book["name"] for book in response.json()["data"]] == ["Loaded Book 1", "Loaded Book 2"]
+
+    # Loading the same files again only finds existing rows
+    report = await main(argv)
+    assert (report["authors"]["created"], report["authors"]["existing"]) == (0, 3)
+    assert (report["books"]["created"], report["books"]["existing"]) == (0, 3)
+    response = await ac.get(f"/authors/{a}/stats")
+    assert response.json()["data"]["book_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_load_books_csv_with_author_and_author_id(ac: AsyncClient, tmp_path):
+    authors = tmp_path / "authors.csv"
+    authors.write_text("name\nLoaded Author C\nLoaded Author D\n")
+    await main(["--authors", str(authors), "--database-url", DATABASE_URL_TEST])
+    c = await author_id(ac, "Loaded Author C")
+
+    # An empty "author" must not discard the row's author_id
+    books = tmp_path / "books.csv"
+    books.write_text(
+        f"name,author,author_id\nLoaded Book 6,,{c}\nLoaded Book 7,Loaded Author D,\n"
+    )
+    report = await main(["--books", str(books), "--database-url", DATABASE_URL_TEST])
+    assert (report["books"]["created"], report["books"]["rejected"]) == (2, 0)
+
+    response = await ac.get(f"/authors/{c}/books")
+    assert [book["name"] for book in response.json()["data"]] == ["Loaded Book 6"]
+
+
+@pytest.mark.asyncio
+async def test_run_pipeline_raises_failed_batch():
+    written = []
+
+    async def write(session, batch):
+        if batch == [2]:
+            raise RuntimeError("batch failed")
+        written.append(batch)
+
+    # More batches than the queue holds, so a stuck reader would hang here
+    batches = ([i] for i in range(10))
+    with pytest.raises(RuntimeError, match="batch failed"):
+        await asyncio.wait_for(run_pipeline(engine_test, batches, write, 1), timeout=5)
+    assert written == [[0], [1]]
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from books.router import fetch_books
+from cache import NullCache, get_cache
+from conftest import app, engine_test
+from loader import BatchLoader
+
+
+class FakeRow:
+    def __init__(self, id):
+        self.id = id
+
+
+class CountingFetch:
+    def __init__(self, missing=(), error=None):
+        self.calls = []
+        self.missing = set(missing)
+        self.error = error
+
+    async def __call__(self, session, ids):
+        self.calls.append(sorted(ids))
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return [FakeRow(id) for id in ids if id not in self.missing]
+
+
+@pytest.mark.asyncio
+async def test_loader_coalesces_concurrent_loads():
+    fetch = CountingFetch(missing={3})
+    loader = BatchLoader(fetch, window_ms=0)
+
+    results = await asyncio.gather(
+        *(loader.load(engine_test, 1) for _ in range(100)),
+        loader.load(engine_test, 2),
+        loader.load(engine_test, 3),
+        loader.load_many(engine_test, [2, 1]),
+    )
+    assert fetch.calls == [[1, 2, 3]]
+    assert all(row.id == 1 for row in results[:100])
+    assert results[100].id == 2
+    assert results[101] is None
+    assert [row.id for row in results[102]] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_loader_joins_queries_in_flight():
+    fetch = CountingFetch()
+    loader = BatchLoader(fetch, window_ms=0)
+
+    first = asyncio.ensure_future(loader.load(engine_test, 1))
+    await asyncio.sleep(0.005)  # the query for 1 has started but not finished
+    second = await loader.load(engine_test, 1)
+    assert (await first).id == second.id == 1
+    assert fetch.calls == [[1]]
+
+    # Once it has finished, the next load queries again
+    await loader.load(engine_test, 1)
+    assert fetch.calls == [[1], [1]]
+
+
+@pytest.mark.asyncio
+async def test_loader_shares_errors():
+    loader = BatchLoader(CountingFetch(error=RuntimeError("boom")), window_ms=0)
+
+    results = await asyncio.gather(
+        loader.load(engine_test, 1), loader.load(engine_test, 2), return_exceptions=True
+    )
+    assert [str(result) for result in results] == ["boom", "boom"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_get_book_runs_one_query(ac: AsyncClient):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(engine_test.sync_engine, "before_cursor_execute", capture)
+    app.dependency_overrides[get_cache] = NullCache
+    try:
+        responses = await asyncio.gather(*(ac.get("/books/1") for _ in range(20)))
+    finally:
+        event.remove(engine_test.sync_engine, "before_cursor_execute", capture)
+        del app.dependency_overrides[get_cache]
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json()["data"]["id"] == 1 for response in responses)
+    assert len(statements) == 1
+
+
+class GatedFetch:
+    # Holds the rows of the first query back until released, like a slow
+    # read that a write overtakes.
+    def __init__(self):
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self, session, ids):
+        self.calls += 1
+        rows = await fetch_books(session, ids)
+        if self.calls == 1:
+            self.started.set()
+            await self.release.wait()
+        return rows
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("null_cache", [False, True])
+@pytest.mark.parametrize("batch_get", [False, True])
+async def test_read_overtaken_by_write_does_not_return_stale_book(
+    ac: AsyncClient, null_cache, batch_get
+):
+    async def read_name(book_id):
+        if batch_get:
+            response = await ac.post("/books/batch-get", json={"ids": [book_id]})
+            return response.json()["data"]["items"][0]["name"]
+        response = await ac.get(f"/books/{book_id}")
+        return response.json()["data"]["name"]
+
+    response = await ac.post("/books", json={"name": "Before", "author_id": 1})
+    book_id = response.json()["data"]["id"]
+    # Installed as the app's own loader, so commits invalidate it
+    fetch = GatedFetch()
+    loaders = app.state.loaders
+    previous = loaders.pop(fetch_books, None)
+    loaders[fetch_books] = BatchLoader(fetch, window_ms=0)
+    if null_cache:
+        app.dependency_overrides[get_cache] = NullCache
+    try:
+        slow = asyncio.ensure_future(read_name(book_id))
+        await fetch.started.wait()
+
+        response = await ac.patch(f"/books/{book_id}", json={"name": "After"})
+        assert response.status_code == 200
+
+        # Must not join the query that started before the write
+        assert await asyncio.wait_for(read_name(book_id), timeout=5) == "After"
+        assert fetch.calls == 2
+
+        fetch.release.set()
+        assert await slow == "Before"
+
+        # The slow read must not have cached its row over the write
+        assert await read_name(book_id) == "After"
+    finally:
+        fetch.release.set()
+        app.dependency_overrides.pop(get_cache, None)
+        del loaders[fetch_books]
+        if previous is not None:
+            loaders[fetch_books] = previous
+        await ac.delete(f"/books/{book_id}")
@@ -0,0 +1,34 @@
+import pytest
+from httpx import AsyncClient
+
+from metrics import Histogram
+
+
+def test_histogram_render():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route="/a")
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+
+
+@pytest.mark.asyncio
+async def test_get_metrics(ac: AsyncClient):
+    await ac.get("/books/1")
+    await ac.get("/books/999")
+
+    response = await ac.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/books/{book_id}"}' in body
+    assert 'http_request_errors_total{status="404",method="GET",route="/books/{book_id}"}' in body
+    assert "http_requests_in_flight 1" in body
+    assert "response_serialization_seconds_count" in body
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from conftest import engine_test
+from profiling import RequestProfile, current_profile, instrument_engine
+
+
+def test_request_profile_keeps_slowest():
+    profile = RequestProfile(keep=2)
+    for duration, statement in [(0.1, "a"), (0.3, "b"), (0.2, "c"), (0.05, "d")]:
+        profile.record(statement, duration)
+
+    assert profile.query_count == 4
+    assert profile.db_time == pytest.approx(0.65)
+    assert [item["statement"] for item in profile.slowest_statements()] == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header(ac: AsyncClient):
+    instrument_engine(engine_test)
+
+    response = await ac.post("/books", json={"name": "Profiled Book", "author_id": 1})
+    assert response.status_code == 200
+
+    server_timing = response.headers["server-timing"]
+    match = re.search(r'db;dur=([\d.]+);desc="(\d+) queries"', server_timing)
+    assert match is not None
+    assert int(match.group(2)) >= 1
+    assert "app;dur=" in server_timing
+
+
+@pytest.mark.asyncio
+async def test_failed_statements_leave_nothing_on_the_connection():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+    profile = RequestProfile(keep=3)
+    token = current_profile.set(profile)
+    try:
+        async with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                await conn.execute(text("SELECT * FROM missing"))
+            await conn.execute(text("SELECT 1"))
+            raw = await conn.get_raw_connection()
+            assert not any("start" in str(key) for key in raw.info)
+    finally:
+        current_profile.reset(token)
+        await engine.dispose()
+
+    assert [item["statement"] for item in profile.slowest_statements()] == ["SELECT 1"]
@@ -0,0 +1,20 @@
+from collections import namedtuple
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from responses import response_class, rows_to_dicts
+
+
+def test_response_class():
+    assert response_class("orjson") is ORJSONResponse
+    assert response_class("json") is JSONResponse
+
+
+def test_rows_to_dicts():
+    Row = namedtuple("Row", ["id", "name", "author_id", "version"])
+    rows = [Row(1, "Book 1", 1, 3), Row(2, "Book 2", None, 1)]
+
+    assert rows_to_dicts(rows, ("id", "name", "author_id")) == [
+        {"id": 1, "name": "Book 1", "author_id": 1},
+        {"id": 2, "name": "Book 2", "author_id": None},
+    ]
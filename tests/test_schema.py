@@ -0,0 +1,105 @@
+import re
+import sqlite3
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from cache import NullCache, get_cache
+from conftest import app, engine_test
+from src.models import metadata
+
+FULL_SCAN = re.compile(r"^SCAN (author|book)\b")
+
+
+def test_migrations_match_models(tmp_path):
+    path = tmp_path / "migrated.db"
+    config = Config("alembic.ini")
+    config.attributes["database_url"] = f"sqlite+aiosqlite:///{path}"
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+    conn = sqlite3.connect(path)
+    try:
+        for table in metadata.sorted_tables:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table.name})")}
+            assert columns == set(table.columns.keys())
+
+            indexes = {
+                row[1]
+                for row in conn.execute(f"PRAGMA index_list({table.name})")
+                if row[3] == "c"  # created by CREATE INDEX, not by a constraint
+            }
+            assert indexes == {index.name for index in table.indexes}
+
+            triggers = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                    (table.name,),
+                )
+            }
+            if table.name in ("author", "book"):
+                assert triggers == {
+                    f"{table.name}_fts_{suffix}" for suffix in ("ai", "ad", "au")
+                }
+            else:
+                assert not triggers
+    finally:
+        conn.close()
+
+    command.downgrade(config, "base")
+
+
+@pytest.mark.asyncio
+async def test_router_queries_use_indexes(ac: AsyncClient):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine_test.sync_engine, "before_cursor_execute", capture)
+    app.dependency_overrides[get_cache] = NullCache
+    try:
+        response = await ac.get("/books?author_id=1&limit=1")
+        cursor = response.json()["next_cursor"]
+        response = await ac.get("/books/search?q=book&limit=1")
+        search_cursor = response.json()["next_cursor"]
+        response = await ac.get("/authors?order_by=book_count&limit=1")
+        count_cursor = response.json()["next_cursor"]
+        for url in [
+            "/authors",
+            "/authors?limit=1",
+            f"/authors?cursor={cursor}",
+            "/authors?name=AUTHOR 1",
+            "/authors/1",
+            "/authors/1?include=books",
+            "/authors/export",
+            "/books",
+            f"/books?author_id=1&cursor={cursor}",
+            "/books?name=book 1",
+            "/books/1",
+            "/books/export?author_id=1",
+            "/authors/search?q=author",
+            f"/authors?order_by=book_count&limit=1&cursor={count_cursor}",
+            "/authors/1/stats",
+            "/authors?expand=books&books_limit=1",
+            f"/authors/1/books?cursor={cursor}",
+            f"/books/search?q=book&limit=1&cursor={search_cursor}",
+        ]:
+            response = await ac.get(url)
+            assert response.status_code == 200, url
+    finally:
+        event.remove(engine_test.sync_engine, "before_cursor_execute", capture)
+        del app.dependency_overrides[get_cache]
+
+    async with engine_test.connect() as conn:
+        for statement, parameters in statements:
+            if " WHERE " not in statement:
+                continue  # unfiltered pages walk the primary key in order
+            plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            scans = [row[-1] for row in plan if FULL_SCAN.match(row[-1])]
+            assert not scans, f"full scan {scans} for: {statement}"
@@ -0,0 +1,13 @@
+from config import Settings
+from serve import worker_environment
+
+
+def test_worker_environment():
+    memory = Settings(cache_url="memory://")
+    assert worker_environment(1, memory) == {"WEB_CONCURRENCY": "1"}
+
+    # A per-process cache would go stale in every worker but the writer's
+    assert worker_environment(4, memory) == {"WEB_CONCURRENCY": "4", "CACHE_URL": "none"}
+
+    redis = Settings(cache_url="redis://localhost:6379/0")
+    assert worker_environment(4, redis) == {"WEB_CONCURRENCY": "4"}